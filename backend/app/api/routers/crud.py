@@ -1,15 +1,19 @@
 import asyncio
 import copy
+import json
 from datetime import datetime
 from typing import Annotated, Iterable
 
+from beanie.odm.queries.find import FindMany
 from fastapi import APIRouter, HTTPException, Query, Depends
 from fastapi_filter import FilterDepends
 from pydantic import Field
 
 from app.auth import Permissions
-from app.models import App
+from app.core.config import settings
+from app.models import App, AppListView, PriceHistory, APPS_COUNT_CACHE_NAMESPACE
 from app.utils.cache import CacheManager
+from app.utils.pagination import add_tiebreaker_ordering, apply_cursor, build_next_cursor
 from app.api.schemas import (
     AppSchema,
     AppEditingSchema,
@@ -47,7 +51,7 @@ def compress_price_collection(price_collection: AppInCountrySchema) -> AppInCoun
     return compressed_price_collection
 
 
-def convert_apps_list_to_compact_format(apps_list: Iterable[App]) -> list[AppsListElementSchema]:
+def convert_apps_list_to_compact_format(apps_list: Iterable[AppListView]) -> list[AppsListElementSchema]:
     compact_apps = []
 
     for app in apps_list:
@@ -73,7 +77,16 @@ def convert_apps_list_to_compact_format(apps_list: Iterable[App]) -> list[AppsLi
     return compact_apps
 
 
-def paginate_app_prices(app: App, page: int, size: int) -> AppWithPaginatedPricesSchema:
+async def paginate_app_prices(
+        app: App,
+        archived_totals: dict[str, int],
+        page: int,
+        size: int
+) -> AppWithPaginatedPricesSchema:
+    """
+    Archive is read only for pages reaching past the latest points kept in the app document
+    """
+
     if app.prices is None:
         return AppWithPaginatedPricesSchema(**app.model_dump())
 
@@ -81,15 +94,18 @@ def paginate_app_prices(app: App, page: int, size: int) -> AppWithPaginatedPrice
 
     for country_code, price_collection in app.prices.items():
         offset = (page - 1) * size
-        prices = price_collection.price_story
+        prices = price_collection.price_story or []
+        archived_total = archived_totals.get(country_code, 0)
         paginated_price_collection[country_code] = AppInCountryWithPaginatedPricesSchema(
             is_available=price_collection.is_available,
             currency=price_collection.currency,
             price_story=PaginatedAppPriceSchema(
-                results=prices[offset:offset + size],
+                results=await PriceHistory.get_price_story_page(
+                    app.id, country_code, prices, archived_total, offset, size
+                ),
                 page=page,
                 size=size,
-                total=len(prices)
+                total=len(prices) + archived_total
             )
         )
 
@@ -98,29 +114,85 @@ def paginate_app_prices(app: App, page: int, size: int) -> AppWithPaginatedPrice
     return AppWithPaginatedPricesSchema(**paginated_app_dump)
 
 
+def build_filters_cache_key(filters: AppFilter) -> str:
+    """
+    Filters differing only by the order of values or by ordering produce the same key
+    """
+
+    normalized_filters = {
+        field_name: sorted(value) if isinstance(value, list) else value
+        for field_name, value in filters.filtering_fields
+    }
+    return json.dumps(normalized_filters, sort_keys=True, default=str)
+
+
+async def count_apps(filters: AppFilter, filtered_apps_query: FindMany[App]) -> int:
+    """
+    Total of unfiltered list is taken from the collection metadata, totals of filtered lists are cached
+    """
+
+    if not dict(filters.filtering_fields):
+        return await App.get_motor_collection().estimated_document_count()
+
+    cache_key = build_filters_cache_key(filters)
+    cached_count = await CacheManager.get(cache_key, namespace=APPS_COUNT_CACHE_NAMESPACE)
+
+    if cached_count:
+        return cached_count['total']
+
+    total = await filtered_apps_query.count()
+    await CacheManager.save(
+        {'total': total},
+        cache_key,
+        expire=settings.APPS_COUNT_CACHE_TIMEOUT,
+        namespace=APPS_COUNT_CACHE_NAMESPACE
+    )
+    return total
+
+
 @router.get('', response_model=PaginatedAppListSchema)
 async def list_apps(
         page: int = Query(1, ge=0),
         size: int = Query(10, ge=1, le=100),
+        cursor: str | None = Query(None),
         filters: AppFilter = FilterDepends(AppFilter)
 ) -> PaginatedAppListSchema:
     # TODO: progressive cache strategy: firstly x2 size of sample, then additional x2, then x4, x8, ...
     # first caching for 1 and 2 pages, second for 3 and 4 (if needed), third for 5, 6, 7 and 8 pages, etc.
-    apps_query = App.find()
+    # pages are requested either by number or by the cursor, returned with the previous page.
+    # cursor pages are read by range predicates instead of skipping
+    # only the latest price points are loaded, that is enough for the compact format
+    apps_query = App.find(projection_model=AppListView)
 
     filtered_apps_query = await filters.filter(apps_query)
-    sorted_apps_query = await filters.sort(filtered_apps_query)
+    sorted_apps_query = add_tiebreaker_ordering(await filters.sort(filtered_apps_query))
+
+    if cursor is not None:
+        try:
+            paginated_apps_query = apply_cursor(copy.deepcopy(sorted_apps_query), cursor)
+        except ValueError as error:
+            raise HTTPException(status_code=400, detail=str(error))
+
+        page = None
 
-    skip = (page - 1) * size
-    paginated_apps_query = copy.deepcopy(sorted_apps_query).skip(skip).limit(size)
-    apps, total = await asyncio.gather(paginated_apps_query.to_list(), sorted_apps_query.count())
+    else:
+        skip = (page - 1) * size
+        paginated_apps_query = copy.deepcopy(sorted_apps_query).skip(skip)
 
-    compact_apps = convert_apps_list_to_compact_format(apps)
+    # one extra app tells if there is a next page
+    apps, total = await asyncio.gather(
+        paginated_apps_query.limit(size + 1).to_list(),
+        count_apps(filters, filtered_apps_query)
+    )
+
+    next_cursor = build_next_cursor(sorted_apps_query, apps[size - 1]) if len(apps) > size else None
+    compact_apps = convert_apps_list_to_compact_format(apps[:size])
     return PaginatedAppListSchema(
         results=compact_apps,
         page=page,
         size=size,
-        total=total
+        total=total,
+        next_cursor=next_cursor
     )
 
 
@@ -132,17 +204,21 @@ async def get_app(app_id: Annotated[int, Field(gt=0)], page: int = Query(1, ge=0
     cache_key = f'app_{app_id}'
     cached_app_data = await CacheManager.get(cache_key)
 
-    if cached_app_data:
-        app = App(**cached_app_data)
-        return paginate_app_prices(app, page, size)
+    # archived totals are cached together with the app, both are reset when the app is updated
+    if cached_app_data and 'archived_totals' in cached_app_data:
+        app = App(**cached_app_data['app'])
+        return await paginate_app_prices(app, cached_app_data['archived_totals'], page, size)
 
-    app = await App.find_one(App.id == app_id)
+    app, archived_totals = await asyncio.gather(
+        App.find_one(App.id == app_id),
+        PriceHistory.count_points(app_id)
+    )
 
     if app is None:
         raise HTTPException(status_code=404, detail=f'App with id {app_id} not found')
 
-    await CacheManager.save(app.model_dump_json(), cache_key)
-    return paginate_app_prices(app, page, size)
+    await CacheManager.save({'app': app.model_dump(mode='json'), 'archived_totals': archived_totals}, cache_key)
+    return await paginate_app_prices(app, archived_totals, page, size)
 
 
 @router.delete('/{app_id}', status_code=204)
@@ -153,12 +229,16 @@ async def delete_app(app_id: Annotated[int, Field(gt=0)], _ = Depends(Permission
         raise HTTPException(status_code=404, detail=f'App with id {app_id} not found')
 
     await app.delete()  # type: ignore
+    await PriceHistory.find(PriceHistory.app_id == app_id).delete()
+    await App.reset_counts_cache()
 
 
 @router.post('', status_code=201, response_model=AppSchema)
 async def create_app(app_data: AppSchema, _ = Depends(Permissions.can_create)):
     await raise_if_app_already_exists(app_data.id)
-    return await App(**app_data.model_dump()).insert()  # type: ignore
+    app = await App(**app_data.model_dump()).insert()  # type: ignore
+    await App.reset_counts_cache()
+    return app
 
 
 @router.patch('/{app_id}', response_model=AppSchema)
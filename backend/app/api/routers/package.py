@@ -1,149 +1,210 @@
+import asyncio
+from collections import defaultdict
 from datetime import datetime
+from typing import Any
 
 from fastapi import APIRouter, Depends
+from pymongo import UpdateOne
 
-from app.models import App
-from app.api.schemas import AppPackageSchema, AppPackageDataSchema, AppInCountrySchema, AppPriceSchema, AppSchema
+from app.models import App, PriceHistory
+from app.api.schemas import AppPackageSchema, AppPackageDataSchema, AppPackagesBulkResultSchema, AppPriceSchema
 from app.auth import Permissions
+from app.utils import timezone
+from app.utils.cache import CacheManager
 
 
 router = APIRouter(prefix='/package')
 
 
-async def build_new_price_collection(package: AppPackageDataSchema) -> AppInCountrySchema:
-    if is_available := package.is_available:
-        # TODO: handle validation errors
-        new_price_story_point = AppPriceSchema(
-            timestamp=package.timestamp,
-            price=package.price,
-            discount=package.discount
-        )
-        new_price_collection = AppInCountrySchema(
-            is_available=is_available,
-            currency=package.currency,
-            price_story=[new_price_story_point]
-        )
-
-    else:
-        new_price_collection = AppInCountrySchema(
-            is_available=is_available,
-        )
-
-    return new_price_collection
-
-
-async def build_new_app_data(package: AppPackageDataSchema) -> AppSchema:
-    new_price_collection = await build_new_price_collection(package)
-    return AppSchema(
-        id=package.id,
-        name=package.name,
-        type=package.type,
-        short_description=package.short_description,
-        is_free=package.is_free,
-        developers=package.developers,
-        publishers=package.publishers,
-        total_recommendations=package.total_recommendations,
-        prices={package.country_code: new_price_collection}
-    )
+# Packages are applied with update pipelines, so every change is computed by mongo on the current document state:
+# cost of a package doesn't depend on the length of the price story and concurrent packages of different
+# countries of the same app don't overwrite each other. Values from packages are wrapped in $literal,
+# otherwise strings starting with "$" would be treated as field paths.
+
+
+def build_common_app_fields_stage(package: AppPackageDataSchema) -> dict[str, Any]:
+    fields = {
+        'name': package.name,
+        'type': package.type,
+        'short_description': package.short_description,
+        'developers': package.developers,
+        'publishers': package.publishers,
+        'total_recommendations': package.total_recommendations,
+    }
+    fields_update = {field: {'$literal': value} for field, value in fields.items() if value}
+
+    if package.is_free is not None:
+        fields_update['is_free'] = {'$literal': package.is_free}
+
+    # new app is created by upsert, so it gets only the fields specified in the package
+    fields_update['updated_at'] = {'$ifNull': ['$updated_at', {'$literal': datetime.now(timezone)}]}
+    return fields_update
 
 
-async def extract_common_app_fields_from_package_into_app(app: AppSchema, package: AppPackageDataSchema) -> AppSchema:
-    app.name = package.name or app.name
-    app.type = package.type or app.type
-    app.short_description = package.short_description or app.short_description
-    app.is_free = package.is_free if package.is_free != app.is_free else app.is_free
-    app.developers = package.developers or app.developers
-    app.publishers = package.publishers or app.publishers
-    app.total_recommendations = package.total_recommendations or app.total_recommendations
-    return app
-
-
-def add_price_story_point_to_price_collection(
-        price_collection: AppInCountrySchema,
-        package: AppPackageDataSchema
-) -> AppInCountrySchema:
-    def add_new_price_story_point():
-        new_price_story_point = AppPriceSchema(
-            timestamp=package.timestamp,
-            price=package.price,
-            discount=package.discount
-        )
-        price_collection.price_story.append(new_price_story_point)
-        price_collection.price_story.sort(
-            key=lambda price_story: datetime.fromisoformat(price_story.timestamp)
-                    if isinstance(price_story.timestamp, str) else price_story.timestamp,
-            reverse=True
-        )
-
-    if not price_collection.price_story:
-        price_collection.price_story = []
-        add_new_price_story_point()
-        return price_collection
-
-    last_price_story_point = price_collection.price_story[0]
-    if last_price_story_point.price != package.price or last_price_story_point.discount != package.discount:
-        add_new_price_story_point()
-
-    return price_collection
-
-
-async def update_existed_price_collection(app: AppSchema, package: AppPackageDataSchema) -> AppInCountrySchema:
-    price_collection = app.prices.get(package.country_code, AppInCountrySchema())
+def build_price_story_expression(package: AppPackageDataSchema) -> dict[str, Any]:
+    """
+    Prepends new price story point only if price or discount differs from the latest one.
+    Story is kept sorted newest-first, so the point of a delayed package is inserted in order instead,
+    unless the story already has a point with the same timestamp (e.g. the package is retried).
+    """
+
+    price_story_path = f'$prices.{package.country_code}.price_story'
+    new_price_story_point = AppPriceSchema(
+        timestamp=package.timestamp,
+        price=package.price,
+        discount=package.discount
+    )
+    new_timestamp = {'$literal': new_price_story_point.timestamp}
+    price_story_with_new_point = {
+        '$concatArrays': [[{'$literal': new_price_story_point.model_dump()}], '$$price_story']
+    }
+
+    is_latest_point = {
+        '$or': [
+            {'$eq': [{'$size': '$$price_story'}, 0]},
+            {'$gte': [new_timestamp, {'$arrayElemAt': ['$$price_story.timestamp', 0]}]},
+        ]
+    }
+    is_latest_price_same = {
+        '$and': [
+            {'$gt': [{'$size': '$$price_story'}, 0]},
+            {'$eq': [{'$arrayElemAt': ['$$price_story.price', 0]}, {'$literal': package.price}]},
+            {'$eq': [{'$arrayElemAt': ['$$price_story.discount', 0]}, {'$literal': package.discount}]},
+        ]
+    }
+
+    return {
+        '$let': {
+            'vars': {'price_story': {'$ifNull': [price_story_path, []]}},
+            'in': {
+                '$switch': {
+                    'branches': [
+                        {
+                            'case': is_latest_point,
+                            'then': {'$cond': [is_latest_price_same, '$$price_story', price_story_with_new_point]},
+                        },
+                        {
+                            'case': {'$in': [new_timestamp, '$$price_story.timestamp']},
+                            'then': '$$price_story',
+                        },
+                    ],
+                    'default': {'$sortArray': {'input': price_story_with_new_point, 'sortBy': {'timestamp': -1}}},
+                }
+            },
+        }
+    }
+
+
+def build_current_price_expression(package: AppPackageDataSchema) -> dict[str, Any]:
+    """
+    Current price is overwritten by every successful package, currency is kept if the package has none
+    """
+
+    current_price = AppPriceSchema(timestamp=package.timestamp, price=package.price, discount=package.discount)
+
+    return {
+        'price': {'$literal': current_price.price},
+        'discount': {'$literal': current_price.discount},
+        'currency': {'$ifNull': [{'$literal': package.currency}, f'$prices.{package.country_code}.currency']},
+        'updated_at': {'$literal': current_price.timestamp},
+    }
+
+
+def build_price_collection_stage(package: AppPackageDataSchema) -> dict[str, Any]:
+    price_collection_path = f'prices.{package.country_code}'
 
     if not package.is_available:
-        if not price_collection.is_available:
-            return price_collection
+        return {f'{price_collection_path}.is_available': False}
+
+    stage = {
+        f'{price_collection_path}.is_available': True,
+        f'{price_collection_path}.current': build_current_price_expression(package),
+        f'{price_collection_path}.price_story': build_price_story_expression(package),
+    }
 
-        price_collection.is_available = False
-        return price_collection
+    if package.currency:
+        stage[f'{price_collection_path}.currency'] = {'$literal': package.currency}
 
-    price_collection.currency = package.currency or price_collection.currency
-    price_collection.is_available = package.is_available \
-        if package.is_available != price_collection.is_available else price_collection.is_available
-    price_collection = add_price_story_point_to_price_collection(price_collection, package)
-    return price_collection
+    return stage
 
 
-async def update_app(app: AppSchema, package: AppPackageDataSchema):
+def build_package_update_pipeline(package: AppPackageDataSchema) -> list[dict[str, Any]]:
+    pipeline = []
+
     if package.is_available:
-        app = await extract_common_app_fields_from_package_into_app(app, package)
+        pipeline.append({'$set': build_common_app_fields_stage(package)})
+
+    pipeline.append({'$set': build_price_collection_stage(package)})
+    return pipeline
 
-    if package.country_code not in app.prices:
-        app.prices[package.country_code] = await build_new_price_collection(package)
 
-    else:
-        app.prices[package.country_code] = await update_existed_price_collection(app, package)
+def is_app_creatable(packages: list[AppPackageDataSchema]) -> bool:
+    # apps are created only from successful packages with app details (name is required)
+    return any(package.is_available and package.name for package in packages)
 
-    await app.update({'$set': app.model_dump(exclude_unset=True)})
 
+def build_app_update_operation(app_id: int, packages: list[AppPackageDataSchema]) -> UpdateOne:
+    pipeline = [stage for package in packages for stage in build_package_update_pipeline(package)]
+    return UpdateOne({'_id': app_id}, pipeline, upsert=is_app_creatable(packages))
 
-async def handle_failed_package(package: AppPackageDataSchema):
-    app = await App.find_one(App.id == package.id)
 
-    if app is None:
-        return
+async def reset_apps_cache(app_ids: list[int]):
+    # raw collection updates bypass document event handlers, so cache is reset manually
+    await asyncio.gather(*(CacheManager.clear(f'app_{app_id}') for app_id in app_ids))
 
-    package.is_available = False
-    await update_app(app, package)
 
+async def handle_package(package: AppPackageDataSchema):
+    result = await App.get_motor_collection().update_one(
+        {'_id': package.id},
+        build_package_update_pipeline(package),
+        upsert=is_app_creatable([package])
+    )
+    await PriceHistory.archive_overflowed_price_stories([package.id], [package.country_code])
+    await reset_apps_cache([package.id])
+
+    if result.upserted_id is not None:
+        await App.reset_counts_cache()
+
+
+async def handle_app_packages(packages: list[AppPackageSchema]) -> list[int]:
+    packages_by_app_id = defaultdict(list)
+
+    for package in packages:
+        package.data.is_available = package.is_success
+        packages_by_app_id[package.data.id].append(package.data)
 
-async def handle_successful_package(package: AppPackageDataSchema):
-    app = await App.find_one(App.id == package.id)
-    package.is_available = True
+    if not packages_by_app_id:
+        return []
 
-    if app is None:
-        new_app_data = await build_new_app_data(package)
-        await App(**new_app_data.model_dump()).insert()  # type: ignore
+    # one operation per app, so concurrent upserts of the same new app within the bulk are impossible
+    operations = [
+        build_app_update_operation(app_id, app_packages)
+        for app_id, app_packages in packages_by_app_id.items()
+    ]
+    result = await App.get_motor_collection().bulk_write(operations, ordered=False)
+    await PriceHistory.archive_overflowed_price_stories(
+        list(packages_by_app_id), [package.data.country_code for package in packages]
+    )
+    await reset_apps_cache(list(packages_by_app_id))
+
+    # counts of lists filtered by changed fields expire by timeout, since apps are updated constantly
+    if result.upserted_count:
+        await App.reset_counts_cache()
 
-    else:
-        await update_app(app, package)
+    return list(packages_by_app_id)
 
 
 @router.post('', status_code=201)
 async def handle_app_package(package: AppPackageSchema, _ = Depends(Permissions.is_worker)) -> AppPackageSchema:
-    if package.is_success:
-        await handle_successful_package(package.data)
-    else:
-        await handle_failed_package(package.data)
-
+    package.data.is_available = package.is_success
+    await handle_package(package.data)
     return package
+
+
+@router.post('/bulk', status_code=201)
+async def handle_app_packages_bulk(
+        packages: list[AppPackageSchema],
+        _ = Depends(Permissions.is_worker)
+) -> AppPackagesBulkResultSchema:
+    app_ids = await handle_app_packages(packages)
+    return AppPackagesBulkResultSchema(app_ids=app_ids, updated_at=datetime.now(timezone))
@@ -108,9 +108,10 @@ class AppsListElementSchema(BaseModel):
 
 class PaginatedAppListSchema(BaseModel):
     results: list[AppsListElementSchema]
-    page: int
+    page: int | None = None
     size: int
-    total: int
+    total: int | None = None
+    next_cursor: str | None = None
 
 
 class AppEditingSchema(BaseModel):
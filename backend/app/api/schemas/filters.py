@@ -1,7 +1,7 @@
-from typing import Optional, Annotated
+from typing import Any, Optional, Annotated
 
 from beanie import SortDirection
-from pydantic import Field
+from pydantic import Field, field_validator
 from beanie.odm.interfaces.find import FindType
 from beanie.odm.queries.find import FindMany
 
@@ -11,6 +11,27 @@ from app.core.config import settings
 from app.models import App
 
 
+# Every combination of these filters and orderings must be served by the indexes of App,
+# checked by python -m app.explain
+EXPLAINED_FILTERS: list[dict[str, Any]] = [
+    {},
+    {'name': 'Portal 2'},
+    {'type': 'game'},
+    {'is_free': True},
+    {'total_recommendations__gte': 1000},
+    {'is_available_in_countries': settings.MAIN_COUNTRY},
+    {'discount__gte': 50},
+    {'discount': 90, 'country': settings.INDEXED_COUNTRIES[-1]},
+    {'price__lte': 10.0},
+]
+EXPLAINED_ORDERINGS: list[list[str]] = [
+    ['total_recommendations'],
+    ['+name'],
+    ['discount'],
+    ['+price'],
+]
+
+
 class AppFilter(Filter):
     name: Optional[str] = None
     name__in: Optional[list[str]] = None
@@ -27,6 +48,14 @@ class AppFilter(Filter):
     discount_eq__method: Annotated[Optional[int], Field(ge=0, le=100, alias='discount')] = None
     discount_gte__method: Annotated[Optional[int], Field(ge=0, le=100, alias='discount__gte')] = None
     discount_lte__method: Annotated[Optional[int], Field(ge=0, le=100, alias='discount__lte')] = None
+    price_gte__method: Annotated[Optional[float], Field(ge=0, alias='price__gte')] = None
+    price_lte__method: Annotated[Optional[float], Field(ge=0, alias='price__lte')] = None
+    # country of price and discount filters and ordering, used in field paths, so only letters are allowed,
+    # current prices are indexed only for INDEXED_COUNTRIES, so other countries are rejected
+    country__method: Annotated[
+        Optional[str],
+        Field(alias='country', pattern=r'^[A-Z]{2}$')
+    ] = None
 
     order_by: list[str] = ["total_recommendations"]
     search__method: Annotated[
@@ -34,33 +63,53 @@ class AppFilter(Filter):
         Field(alias='search')
     ] = None
 
+    @field_validator('country__method')
+    def validate_country(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None and value not in settings.INDEXED_COUNTRIES:
+            raise ValueError(f'Prices are filtered only in countries: {", ".join(settings.INDEXED_COUNTRIES)}')
+
+        return value
+
+    @property
+    def current_price_path(self) -> str:
+        return f"prices.{self.country__method or settings.MAIN_COUNTRY}.current"
+
     @staticmethod
     async def filter__is_available_in_countries(query: FindMany[FindType], value: str):
         return query.find_many(
             {f"prices.{country}.is_available": {'$eq': True} for country in value.split(',')}
         )
 
-    @staticmethod
-    async def filter__discount_eq(query: FindMany[FindType], value: int):
+    async def filter__discount_eq(self, query: FindMany[FindType], value: int):
         return query.find_many(
-            {f"prices.{settings.MAIN_COUNTRY}.price_story.0.discount": {'$eq': value}}
+            {f"{self.current_price_path}.discount": {'$eq': value}}
         )
 
-    @staticmethod
-    async def filter__discount_gte(query: FindMany[FindType], value: int):
+    async def filter__discount_gte(self, query: FindMany[FindType], value: int):
         return query.find_many(
-            {f"prices.{settings.MAIN_COUNTRY}.price_story.0.discount": {'$gte': value}}
+            {f"{self.current_price_path}.discount": {'$gte': value}}
         )
 
-    @staticmethod
-    async def filter__discount_lte(query: FindMany[FindType], value: int):
+    async def filter__discount_lte(self, query: FindMany[FindType], value: int):
         return query.find_many(
-            {f"prices.{settings.MAIN_COUNTRY}.price_story.0.discount": {'$lte': value}}
+            {f"{self.current_price_path}.discount": {'$lte': value}}
         )
 
-    @staticmethod
-    async def sort__discount(query: FindMany[FindType], direction: SortDirection):
-        return query.sort((f"prices.{settings.MAIN_COUNTRY}.price_story.0.discount", direction))
+    async def filter__price_gte(self, query: FindMany[FindType], value: float):
+        return query.find_many(
+            {f"{self.current_price_path}.price": {'$gte': value}}
+        )
+
+    async def filter__price_lte(self, query: FindMany[FindType], value: float):
+        return query.find_many(
+            {f"{self.current_price_path}.price": {'$lte': value}}
+        )
+
+    async def sort__discount(self, query: FindMany[FindType], direction: SortDirection):
+        return query.sort((f"{self.current_price_path}.discount", direction))
+
+    async def sort__price(self, query: FindMany[FindType], direction: SortDirection):
+        return query.sort((f"{self.current_price_path}.price", direction))
 
     @staticmethod
     async def filter__search(query: FindMany[FindType], value: str):
@@ -69,7 +118,9 @@ class AppFilter(Filter):
 
     class Constants(Filter.Constants):
         model = App
-        custom_ordering_fields = ("discount", )
+        custom_ordering_fields = ("discount", "price")
+        # cursors are built from the listed apps, so only fields projected by AppListView are allowed
+        ordering_fields = ("name", "type", "is_free", "total_recommendations", "updated_at")
 
     class Config:
         populate_by_name = True
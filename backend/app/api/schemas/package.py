@@ -9,6 +9,7 @@ from app.utils import timezone
 __all__ = (
     'AppPackageSchema',
     'AppPackageDataSchema',
+    'AppPackagesBulkResultSchema',
 )
 
 
@@ -22,7 +23,8 @@ class AppPackageDataSchema(BaseModel):
     developers: list[str] | None = None
     publishers: list[str] | None = None
     total_recommendations: int | None = None
-    country_code: Annotated[str, Field(max_length=2)]
+    # used in field paths of updates, so only letters are allowed
+    country_code: Annotated[str, Field(max_length=2, pattern=r'^[A-Za-z]{2}$')]
     is_available: Annotated[bool, Field(default=True)]
     currency: Annotated[str | None, Field(max_length=3, default=None)]
     price: Annotated[float | None, Field(gt=-0.01, default=None)]
@@ -60,3 +62,9 @@ class AppPackageDataSchema(BaseModel):
 class AppPackageSchema(BaseModel):
     data: AppPackageDataSchema
     is_success: bool
+
+
+class AppPackagesBulkResultSchema(BaseModel):
+    app_ids: list[int]
+    # time when packages were applied, orchestrator schedules next updates from it
+    updated_at: datetime
@@ -30,6 +30,8 @@ class Settings(BaseSettings):
     TIME_ZONE: str = 'Europe/Moscow'
     USE_TZ: bool = True
     MAIN_COUNTRY: str = 'US'
+    # current prices of these countries are indexed for filtering and sorting
+    INDEXED_COUNTRIES: list[str] = ['US', 'GB', 'CN', 'RU', 'DE', 'JP', 'BR']
 
     ESSENTIAL_BACKEND_CLIENT_ID: str = 'backend'
     ESSENTIAL_BACKEND_CLIENT_SECRET: str = 'CHANGE-ME'
@@ -90,6 +92,8 @@ class Settings(BaseSettings):
     MONGO_DB: str = 'apps'
     MONGO_USER: str = 'admin'
     MONGO_PASSWORD: str = 'admin'
+    # indexes missing in the documents settings (e.g. created manually) are dropped on startup only if enabled
+    MONGO_DROP_UNDECLARED_INDEXES: bool = False
 
     @computed_field
     @property
@@ -102,11 +106,16 @@ class Settings(BaseSettings):
             password=self.MONGO_PASSWORD
         ).unicode_string()
 
+    PRICE_STORY_SIZE: int = 50
+    PRICE_STORY_ARCHIVING_BATCH_SIZE: int = 10
+
     CACHE_TIMEOUT: int = 60 * 20
     CACHE_PREFIX: str = 'backend-cache'
     CACHE_HOST: str = 'localhost'
     CACHE_PORT: int = 6379
     CACHE_PROTOCOL: str = 'redis'
+    # counts of filtered apps lists are also reset when new apps are created
+    APPS_COUNT_CACHE_TIMEOUT: int = 60
 
     @computed_field
     @property
@@ -0,0 +1,112 @@
+"""
+Check of the query plans of the apps list for every supported filter and ordering combination:
+
+    python -m app.explain
+
+Exits with non-zero code if any plan scans the whole collection, sorts in memory or examines far more documents
+than it returns, so missing indexes are caught before deploy.
+Plans are checked against the indexes the database already has. Indexes of the registry of App are created
+before the check only with --create-indexes (e.g. for a fresh database), other indexes are never dropped.
+"""
+
+import argparse
+import asyncio
+import itertools
+import sys
+from typing import Any, Iterable
+
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app.models import DOCUMENTS, App, AppListView
+from app.api.schemas.filters import AppFilter, EXPLAINED_FILTERS, EXPLAINED_ORDERINGS
+from app.utils.pagination import add_tiebreaker_ordering
+
+
+COLLECTION_SCAN_STAGE = 'COLLSCAN'
+# sort not provided by an index reads all matched documents before returning the first one
+BLOCKING_SORT_STAGE = 'SORT'
+MAX_EXAMINED_DOCS_PER_RETURNED = 10
+
+
+def iter_plan_stages(plan: Any) -> Iterable[str]:
+    if isinstance(plan, list):
+        for sub_plan in plan:
+            yield from iter_plan_stages(sub_plan)
+
+    if not isinstance(plan, dict):
+        return
+
+    if 'stage' in plan:
+        yield plan['stage']
+
+    for value in plan.values():
+        yield from iter_plan_stages(value)
+
+
+def get_plan_problems(stages: list[str], execution_stats: dict[str, Any]) -> list[str]:
+    problems = []
+
+    if COLLECTION_SCAN_STAGE in stages:
+        problems.append('collection scan')
+
+    if BLOCKING_SORT_STAGE in stages:
+        problems.append('in-memory sort')
+
+    examined_count, returned_count = execution_stats['totalDocsExamined'], execution_stats['nReturned']
+
+    if examined_count > MAX_EXAMINED_DOCS_PER_RETURNED * max(returned_count, 1):
+        problems.append(f'{examined_count} documents examined for {returned_count} returned')
+
+    return problems
+
+
+async def explain_apps_list(params: dict[str, Any], size: int) -> tuple[list[str], dict[str, Any]]:
+    filters = AppFilter.model_validate(params)
+    apps_query = await filters.filter(App.find(projection_model=AppListView))
+    apps_query = add_tiebreaker_ordering(await filters.sort(apps_query))
+
+    explanation = await (
+        App.get_motor_collection()
+        .find(apps_query.get_filter_query())
+        .sort(apps_query.sort_expressions)
+        .limit(size + 1)
+        .explain()
+    )
+    stages = list(iter_plan_stages(explanation['queryPlanner']['winningPlan']))
+    return stages, explanation['executionStats']
+
+
+async def run_explain(size: int, create_indexes: bool) -> bool:
+    db_client = getattr(AsyncIOMotorClient(settings.MONGO_URL), settings.MONGO_DB)
+    await init_beanie(db_client, document_models=DOCUMENTS, skip_indexes=not create_indexes)
+    is_every_plan_indexed = True
+
+    for filter_params, ordering in itertools.product(EXPLAINED_FILTERS, EXPLAINED_ORDERINGS):
+        params = {**filter_params, 'order_by': ordering}
+        stages, execution_stats = await explain_apps_list(params, size)
+        problems = get_plan_problems(stages, execution_stats)
+        is_every_plan_indexed &= not problems
+
+        print(
+            f'{"FAIL" if problems else "OK  "} {params}: {" -> ".join(reversed(stages))}'
+            f'{" (" + ", ".join(problems) + ")" if problems else ""}'
+        )
+
+    db_client.client.close()
+    return is_every_plan_indexed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check of the query plans of the apps list')
+    parser.add_argument('--size', type=int, default=100)
+    parser.add_argument('--create-indexes', action='store_true')
+    args = parser.parse_args()
+
+    if not asyncio.run(run_explain(args.size, args.create_indexes)):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+One-off filling of current prices of apps stored before current prices were introduced:
+
+    python -m app.fill_current_prices
+
+Ingestion and edits keep current prices of the apps up to date, so the command is needed only once after deploy.
+Running it again updates nothing.
+"""
+
+import argparse
+import asyncio
+
+import redis.asyncio as redis
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+from redis.asyncio import ConnectionPool
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.models import DOCUMENTS, App
+from app.utils.cache import CacheManager, RedisBackend
+
+
+async def run_filling(batch_size: int) -> int:
+    db_client = getattr(AsyncIOMotorClient(settings.MONGO_URL), settings.MONGO_DB)
+    await init_beanie(db_client, document_models=DOCUMENTS)
+
+    # caches of the updated apps are reset
+    cache_pool = ConnectionPool.from_url(url=settings.CACHE_URL)
+    CacheManager.init(
+        RedisBackend(redis.Redis(connection_pool=cache_pool)),
+        prefix=settings.CACHE_PREFIX,
+        expire=settings.CACHE_TIMEOUT,
+        logger=get_logger(settings, 'cache'),
+    )
+
+    try:
+        return await App.fill_missing_current_prices(batch_size)
+
+    finally:
+        CacheManager.reset()
+        db_client.client.close()
+        await cache_pool.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='One-off filling of current prices of apps')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    updated_count = asyncio.run(run_filling(args.batch_size))
+    print(f'Current prices filled for {updated_count} apps')
+
+
+if __name__ == '__main__':
+    main()
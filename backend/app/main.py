@@ -20,7 +20,13 @@ from app.external_api import OrchestratorAPIClient
 @asynccontextmanager
 async def lifespan(app_: FastAPI):
     app_.db_client = getattr(AsyncIOMotorClient(settings.MONGO_URL), settings.MONGO_DB)
-    await init_beanie(app_.db_client, document_models=DOCUMENTS)
+    # indexes declared in the documents settings are created here,
+    # indexes missing in the settings are dropped only if it's enabled explicitly
+    await init_beanie(
+        app_.db_client,
+        document_models=DOCUMENTS,
+        allow_index_dropping=settings.MONGO_DROP_UNDECLARED_INDEXES
+    )
 
     cache_pool = ConnectionPool.from_url(url=settings.CACHE_URL)
     redis_instance = redis.Redis(connection_pool=cache_pool)
@@ -1,6 +1,8 @@
 from .steam import *
+from .price_history import *
 
 
 DOCUMENTS = (
     App,
+    PriceHistory,
 )
@@ -0,0 +1,160 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Annotated, Any
+
+from pydantic import Field
+from pymongo import IndexModel, UpdateOne, ASCENDING, DESCENDING
+from beanie import Document
+
+from app.core.config import settings
+from app.models.steam import App, AppPrice
+
+
+__all__ = (
+    'PriceHistory',
+)
+
+
+# Points beyond this index are not read from the app document
+MAX_PRICE_STORY_SLICE = 10 ** 6
+# Month of archived points without timestamp
+UNKNOWN_MONTH = datetime(1970, 1, 1)
+
+
+class PriceHistory(Document):
+    """
+    Archived price story points of the app in the country, one document per month.
+    App document keeps only the latest PRICE_STORY_SIZE points, older ones are moved here.
+    """
+
+    class Settings:
+        name = 'price_history'
+        indexes = [
+            IndexModel(
+                [('app_id', ASCENDING), ('country_code', ASCENDING), ('month', DESCENDING)],
+                unique=True
+            ),
+        ]
+
+    app_id: int
+    country_code: Annotated[str, Field(max_length=2)]
+    month: datetime
+    points: list[AppPrice] = []
+
+    @staticmethod
+    def get_month(timestamp: datetime | None) -> datetime:
+        if timestamp is None:
+            return UNKNOWN_MONTH
+
+        return timestamp.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    @classmethod
+    async def archive_overflowed_price_stories(cls, app_ids: list[int], country_codes: list[str]):
+        """
+        Moves price story points exceeding PRICE_STORY_SIZE from the app documents into the archive.
+        Points are archived in batches, only when the story exceeds the size by PRICE_STORY_ARCHIVING_BATCH_SIZE.
+        Archiving is idempotent, so points are removed from app documents only after they are archived.
+        """
+
+        country_codes = list(set(country_codes))
+        overflow_index = settings.PRICE_STORY_SIZE + settings.PRICE_STORY_ARCHIVING_BATCH_SIZE
+
+        overflowed_apps = await App.get_motor_collection().aggregate([
+            {'$match': {
+                '_id': {'$in': app_ids},
+                '$or': [
+                    {f'prices.{country_code}.price_story.{overflow_index}': {'$exists': True}}
+                    for country_code in country_codes
+                ],
+            }},
+            {'$project': {
+                country_code: {'$slice': [
+                    {'$ifNull': [f'$prices.{country_code}.price_story', []]},
+                    settings.PRICE_STORY_SIZE,
+                    MAX_PRICE_STORY_SLICE,
+                ]}
+                for country_code in country_codes
+            }},
+        ]).to_list(None)
+
+        archive_operations = []
+        trim_operations = []
+
+        for overflowed_app in overflowed_apps:
+            trim_stage = {}
+
+            for country_code in country_codes:
+                if not (overflowed_points := overflowed_app.get(country_code)):
+                    continue
+
+                points_by_month = defaultdict(list)
+
+                for point in overflowed_points:
+                    points_by_month[cls.get_month(point.get('timestamp'))].append(point)
+
+                for month, points in points_by_month.items():
+                    archive_operations.append(UpdateOne(
+                        {'app_id': overflowed_app['_id'], 'country_code': country_code, 'month': month},
+                        {'$addToSet': {'points': {'$each': points}}},
+                        upsert=True
+                    ))
+
+                # new points could be added anywhere in the story since it was read,
+                # so exactly the archived points are removed instead of the same positions
+                price_story_path = f'prices.{country_code}.price_story'
+                trim_stage[price_story_path] = {'$filter': {
+                    'input': f'${price_story_path}',
+                    'cond': {'$not': [{'$in': ['$$this', {'$literal': overflowed_points}]}]},
+                }}
+
+            if trim_stage:
+                trim_operations.append(UpdateOne({'_id': overflowed_app['_id']}, [{'$set': trim_stage}]))
+
+        if not archive_operations:
+            return
+
+        await cls.get_motor_collection().bulk_write(archive_operations, ordered=False)
+        await App.get_motor_collection().bulk_write(trim_operations, ordered=False)
+
+    @classmethod
+    async def count_points(cls, app_id: int) -> dict[str, int]:
+        counts = await cls.get_motor_collection().aggregate([
+            {'$match': {'app_id': app_id}},
+            {'$group': {'_id': '$country_code', 'total': {'$sum': {'$size': '$points'}}}},
+        ]).to_list(None)
+        return {count['_id']: count['total'] for count in counts}
+
+    @classmethod
+    async def get_points(cls, app_id: int, country_code: str, skip: int, limit: int) -> list[AppPrice]:
+        points = await cls.get_motor_collection().aggregate([
+            {'$match': {'app_id': app_id, 'country_code': country_code}},
+            {'$unwind': '$points'},
+            {'$replaceRoot': {'newRoot': '$points'}},
+            {'$sort': {'timestamp': DESCENDING}},
+            {'$skip': skip},
+            {'$limit': limit},
+        ]).to_list(None)
+        return [AppPrice(**point) for point in points]
+
+    @classmethod
+    async def get_price_story_page(
+            cls,
+            app_id: int,
+            country_code: str,
+            price_story: list[Any],
+            archived_total: int,
+            offset: int,
+            size: int
+    ) -> list[Any]:
+        """
+        Reads the page across the latest points in the app document and archived ones
+        """
+
+        page = price_story[offset:offset + size]
+
+        if len(page) == size or not archived_total:
+            return page
+
+        archive_offset = max(0, offset - len(price_story))
+        archived_points = await cls.get_points(app_id, country_code, archive_offset, size - len(page))
+        return page + archived_points
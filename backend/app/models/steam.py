@@ -1,9 +1,12 @@
+import asyncio
 from datetime import datetime, UTC
 from typing import Annotated
 
 from pydantic import Field, BaseModel, field_validator
-from beanie import Indexed, after_event, Replace, Update, SaveChanges, Delete
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from beanie import Indexed, after_event, before_event, Insert, Replace, Save, Update, SaveChanges, Delete
 
+from app.core.config import settings
 from app.utils import timezone
 from app.utils.cache import CacheManager
 
@@ -12,11 +15,17 @@ __all__ = (
     'App',
     'AppInCountry',
     'AppPrice',
+    'AppCurrentPrice',
+    'AppListView',
+    'APPS_COUNT_CACHE_NAMESPACE',
 )
 
 from app.models.utils import BaseDocument
 
 
+APPS_COUNT_CACHE_NAMESPACE = 'apps_count'
+
+
 class AppPrice(BaseModel):
     timestamp: datetime | None = None
     price: Annotated[float, Field(gt=-0.01)] | None = None
@@ -31,15 +40,51 @@ class AppPrice(BaseModel):
         return v
 
 
+class AppCurrentPrice(BaseModel):
+    """
+    Copy of the latest price story point, kept flat so it can be indexed for every country
+    """
+
+    price: Annotated[float, Field(gt=-0.01)] | None = None
+    discount: Annotated[int, Field(gt=-1, lt=100)] | None = None
+    currency: Annotated[str, Field(max_length=3)] | None = None
+    updated_at: datetime | None = None
+
+    @field_validator('updated_at', mode='after')
+    @classmethod
+    def convert_utc_to_local(cls, v):
+        if v is not None and (v.tzinfo is None or v.tzinfo.utcoffset(v) == UTC.utcoffset(v)):
+            v = v.astimezone(timezone)
+
+        return v
+
+
 class AppInCountry(BaseModel):
     is_available: Annotated[bool, Field(default=True)]
     currency: Annotated[str, Field(max_length=3)] | None = None
+    current: AppCurrentPrice | None = None
     price_story: list[AppPrice] | None = None
 
 
 class App(BaseDocument):
     class Settings:
         name = 'apps'
+        # registry of indexes serving filters and orderings of AppFilter, reconciled with the collection on startup.
+        # Filter and ordering combinations served by them are listed in app.api.schemas.filters.
+        indexes = [
+            IndexModel([('total_recommendations', DESCENDING), ('_id', DESCENDING)]),
+            IndexModel([('type', ASCENDING), ('total_recommendations', DESCENDING), ('_id', DESCENDING)]),
+            IndexModel([('is_free', ASCENDING), ('total_recommendations', DESCENDING), ('_id', DESCENDING)]),
+            *(
+                IndexModel([(f'prices.{country_code}.is_available', ASCENDING)])
+                for country_code in settings.INDEXED_COUNTRIES
+            ),
+            *(
+                IndexModel([(f'prices.{country_code}.current.{field}', DESCENDING), ('_id', DESCENDING)])
+                for country_code in settings.INDEXED_COUNTRIES
+                for field in ('discount', 'price')
+            ),
+        ]
 
     id: Annotated[int, Indexed]
     name: Annotated[str, Indexed]
@@ -65,3 +110,114 @@ class App(BaseDocument):
     async def reset_cache(self):
         cache_key = f'app_{self.id}'
         await CacheManager.clear(cache_key)
+
+    @before_event(Insert, Replace, Save)
+    def fill_current_prices(self):
+        for price_collection in (self.prices or {}).values():
+            if not price_collection.price_story:
+                continue
+
+            latest_price_point = price_collection.price_story[0]
+            price_collection.current = AppCurrentPrice(
+                price=latest_price_point.price,
+                discount=latest_price_point.discount,
+                currency=price_collection.currency,
+                updated_at=latest_price_point.timestamp,
+            )
+
+    @classmethod
+    async def fill_missing_current_prices(cls, batch_size: int = 1000) -> int:
+        """
+        Current prices of apps stored before they were introduced are filled from their price stories.
+        Apps are updated in batches and their caches are reset, returns the amount of updated apps.
+        """
+
+        prices = {'$objectToArray': {'$ifNull': ['$prices', {}]}}
+        latest_price_point = {'$arrayElemAt': ['$$this.v.price_story', 0]}
+        missing_current_prices_filter = {'$expr': {'$anyElementTrue': [{'$map': {
+            'input': prices,
+            'in': {'$and': [
+                {'$eq': [{'$type': '$$this.v.current'}, 'missing']},
+                {'$gt': [{'$size': {'$ifNull': ['$$this.v.price_story', []]}}, 0]},
+            ]},
+        }}]}}
+        filling_pipeline = [{'$set': {'prices': {'$arrayToObject': {'$map': {
+            'input': prices,
+            'in': {
+                'k': '$$this.k',
+                'v': {'$mergeObjects': ['$$this.v', {'current': {'$ifNull': ['$$this.v.current', {
+                    'price': {'$getField': {'field': 'price', 'input': latest_price_point}},
+                    'discount': {'$getField': {'field': 'discount', 'input': latest_price_point}},
+                    'currency': '$$this.v.currency',
+                    'updated_at': {'$getField': {'field': 'timestamp', 'input': latest_price_point}},
+                }]}}]},
+            },
+        }}}}}]
+
+        async def fill_batch(app_ids: list[int]):
+            await cls.get_motor_collection().update_many({'_id': {'$in': app_ids}}, filling_pipeline)
+            await asyncio.gather(*(CacheManager.clear(f'app_{app_id}') for app_id in app_ids))
+
+        updated_count = 0
+        app_ids = []
+
+        async for app in cls.get_motor_collection().find(missing_current_prices_filter, {'_id': 1}):
+            app_ids.append(app['_id'])
+
+            if len(app_ids) >= batch_size:
+                await fill_batch(app_ids)
+                updated_count += len(app_ids)
+                app_ids = []
+
+        if app_ids:
+            await fill_batch(app_ids)
+            updated_count += len(app_ids)
+
+        return updated_count
+
+    @staticmethod
+    async def reset_counts_cache():
+        await CacheManager.clear('', namespace=APPS_COUNT_CACHE_NAMESPACE)
+
+
+class AppListView(BaseModel):
+    """
+    Projection of the app for lists: price stories are cut to the latest point by mongo,
+    so the rest of the story is neither transferred nor validated
+    """
+
+    class Settings:
+        projection = {
+            '_id': 1,
+            'name': 1,
+            'updated_at': 1,
+            'type': 1,
+            'short_description': 1,
+            'is_free': 1,
+            'developers': 1,
+            'publishers': 1,
+            'total_recommendations': 1,
+            'prices': {'$arrayToObject': {'$map': {
+                'input': {'$objectToArray': '$prices'},
+                'in': {
+                    'k': '$$this.k',
+                    'v': {
+                        'is_available': '$$this.v.is_available',
+                        'currency': '$$this.v.currency',
+                        'current': '$$this.v.current',
+                        'price_story': {'$slice': [{'$ifNull': ['$$this.v.price_story', []]}, 1]},
+                    },
+                },
+            }}},
+        }
+
+    id: Annotated[int, Field(alias='_id')]
+    name: str | None = None
+    updated_at: datetime | None = None
+    type: str | None = None
+    short_description: str | None = None
+    is_free: bool | None = None
+    developers: list[str] | None = None
+    publishers: list[str] | None = None
+    total_recommendations: int | None = None
+    prices: dict[Annotated[str, Field(max_length=2)], AppInCountry] | None = None
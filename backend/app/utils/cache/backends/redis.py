@@ -6,6 +6,8 @@ from app.utils.cache.types import Backend
 
 
 class RedisBackend(Backend):
+    CLEAR_BATCH_SIZE: int = 1000
+
     def __init__(self, redis: Redis):
         self.redis = redis
 
@@ -16,11 +18,24 @@ class RedisBackend(Backend):
         await self.redis.set(key, value, ex=expire)
 
     async def clear(self, namespace: Optional[str] = None, key: Optional[str] = None) -> int:
-        if namespace:
-            lua = f"for i, name in ipairs(redis.call('KEYS', '{namespace}:*')) do redis.call('DEL', name); end"
-            return await self.redis.eval(lua, numkeys=0)  # type: ignore[union-attr,no-any-return]
-
         if key:
             return await self.redis.delete(key)
 
+        if namespace:
+            # SCAN doesn't block redis for the whole keyspace like KEYS does
+            deleted_count = 0
+            names = []
+
+            async for name in self.redis.scan_iter(match=f'{namespace}:*', count=self.CLEAR_BATCH_SIZE):
+                names.append(name)
+
+                if len(names) >= self.CLEAR_BATCH_SIZE:
+                    deleted_count += await self.redis.delete(*names)
+                    names = []
+
+            if names:
+                deleted_count += await self.redis.delete(*names)
+
+            return deleted_count
+
         return 0
@@ -82,11 +82,15 @@ class CacheManager:
         namespace = prefix + (":" + namespace if namespace else "")
         cache_key_builder = key_builder or cls.get_key_builder()
 
+        # whole namespace is cleared only if no key is given
+        if not key:
+            return await backend.clear(namespace=namespace)
+
         cache_key = cache_key_builder(
             namespace,
             original_key=key
         )
-        return await backend.clear(namespace, cache_key)
+        return await backend.clear(key=cache_key)
 
     @classmethod
     async def get(
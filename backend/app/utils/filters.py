@@ -39,6 +39,8 @@ class Filter(BaseFilterModel):
         prefix: str
         original_filter: type["BaseFilterModel"]
         custom_ordering_fields: tuple[str] = ()
+        # if declared, only these fields of the model can be used for ordering
+        ordering_fields: tuple[str] = ()
 
     async def sort(self, query: FindMany[FindType]) -> FindMany[FindType]:
         if not self.ordering_values:
@@ -81,7 +83,12 @@ class Filter(BaseFilterModel):
         for field_name_with_direction in value:
             field_name = field_name_with_direction.strip().replace("-", "").replace("+", "")
 
-            if not hasattr(cls.Constants.model, field_name) and field_name not in cls.Constants.custom_ordering_fields:
+            is_ordering_field = (
+                field_name in cls.Constants.ordering_fields if cls.Constants.ordering_fields
+                else hasattr(cls.Constants.model, field_name)
+            )
+
+            if not is_ordering_field and field_name not in cls.Constants.custom_ordering_fields:
                 raise ValueError(f"{field_name} is not a valid ordering field.")
 
             field_name_usages[field_name].append(field_name_with_direction)
@@ -0,0 +1,110 @@
+import base64
+from typing import Any
+
+from beanie import SortDirection
+from beanie.odm.interfaces.find import FindType
+from beanie.odm.queries.find import FindMany
+from bson import json_util
+
+
+ID_FIELD = '_id'
+
+
+def encode_cursor(sort_keys: list[str], values: list[Any]) -> str:
+    dumped_cursor = json_util.dumps({'keys': sort_keys, 'values': values})
+    return base64.urlsafe_b64encode(dumped_cursor.encode()).decode()
+
+
+def decode_cursor(cursor: str, sort_keys: list[str]) -> list[Any]:
+    try:
+        loaded_cursor = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+        keys, values = loaded_cursor['keys'], loaded_cursor['values']
+    except Exception:
+        raise ValueError('Malformed cursor')
+
+    if keys != sort_keys or len(values) != len(sort_keys):
+        raise ValueError('Cursor was issued for another ordering')
+
+    return values
+
+
+def get_value_by_path(document_dump: dict[str, Any], path: str) -> Any:
+    value = document_dump
+
+    for part in path.split('.'):
+        if isinstance(value, dict):
+            value = value.get(part)
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return None
+
+    return value
+
+
+def build_range_condition(key: str, value: Any, direction: SortDirection) -> dict[str, Any] | None:
+    """
+    Mongo sorts nulls before any other value and doesn't match them by range operators,
+    so they are handled separately
+    """
+
+    if direction == SortDirection.ASCENDING:
+        return {key: {'$ne': None}} if value is None else {key: {'$gt': value}}
+
+    if value is None:
+        return None
+
+    return {'$or': [{key: {'$lt': value}}, {key: None}]}
+
+
+def build_keyset_condition(sort_expressions: list[tuple[str, SortDirection]], values: list[Any]) -> dict[str, Any]:
+    """
+    Documents after the cursor: (k1 > v1) or (k1 = v1 and k2 > v2) or ... with the direction of each key
+    """
+
+    alternatives = []
+
+    for position, (key, direction) in enumerate(sort_expressions):
+        range_condition = build_range_condition(key, values[position], direction)
+
+        if range_condition is None:
+            continue
+
+        equalities = [
+            {previous_key: values[previous_position]}
+            for previous_position, (previous_key, _) in enumerate(sort_expressions[:position])
+        ]
+        alternatives.append({'$and': [*equalities, range_condition]} if equalities else range_condition)
+
+    return {'$or': alternatives} if alternatives else {ID_FIELD: {'$in': []}}
+
+
+def add_tiebreaker_ordering(query: FindMany[FindType]) -> FindMany[FindType]:
+    """
+    Unique id ends every ordering, so pages neither overlap nor skip documents with equal sort keys
+    """
+
+    if any(key == ID_FIELD for key, _ in query.sort_expressions):
+        return query
+
+    direction = query.sort_expressions[-1][1] if query.sort_expressions else SortDirection.ASCENDING
+    return query.sort((ID_FIELD, direction))
+
+
+def get_sort_keys(query: FindMany[FindType]) -> list[str]:
+    return [key for key, _ in query.sort_expressions]
+
+
+def build_next_cursor(query: FindMany[FindType], last_document: FindType) -> str:
+    document_dump = last_document.model_dump(by_alias=True)
+    sort_keys = get_sort_keys(query)
+    return encode_cursor(sort_keys, [get_value_by_path(document_dump, key) for key in sort_keys])
+
+
+def apply_cursor(query: FindMany[FindType], cursor: str) -> FindMany[FindType]:
+    """
+    Range predicate replaces skip, so the cost of a page doesn't depend on its depth
+    """
+
+    values = decode_cursor(cursor, get_sort_keys(query))
+    return query.find(build_keyset_condition(query.sort_expressions, values))
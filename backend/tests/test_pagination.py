@@ -0,0 +1,190 @@
+import functools
+from typing import Any
+
+import pytest
+from beanie import SortDirection
+
+from app.utils.pagination import (
+    add_tiebreaker_ordering,
+    build_keyset_condition,
+    build_range_condition,
+    decode_cursor,
+    encode_cursor,
+    get_value_by_path,
+)
+
+
+class FakeQuery:
+    def __init__(self, sort_expressions: list[tuple[str, SortDirection]]):
+        self.sort_expressions = sort_expressions
+
+    def sort(self, *sort_expressions: tuple[str, SortDirection]) -> 'FakeQuery':
+        return FakeQuery([*self.sort_expressions, *sort_expressions])
+
+
+def matches(document: dict[str, Any], condition: dict[str, Any]) -> bool:
+    """
+    Evaluates the subset of mongo query operators used by keyset conditions, null matches missing fields as well
+    """
+
+    for key, expected in condition.items():
+        if key == '$or':
+            is_matched = any(matches(document, sub_condition) for sub_condition in expected)
+        elif key == '$and':
+            is_matched = all(matches(document, sub_condition) for sub_condition in expected)
+        elif isinstance(expected, dict):
+            value = get_value_by_path(document, key)
+            is_matched = all(matches_operator(value, operator, operand) for operator, operand in expected.items())
+        else:
+            is_matched = get_value_by_path(document, key) == expected
+
+        if not is_matched:
+            return False
+
+    return True
+
+
+def matches_operator(value: Any, operator: str, operand: Any) -> bool:
+    if operator == '$ne':
+        return value != operand
+    if operator == '$in':
+        return value in operand
+    # range operators don't match nulls
+    if value is None:
+        return False
+    if operator == '$gt':
+        return value > operand
+    if operator == '$lt':
+        return value < operand
+
+    raise ValueError(operator)
+
+
+def sort_documents(documents: list[dict[str, Any]], sort_expressions: list[tuple[str, SortDirection]]):
+    """
+    Mongo order: nulls are less than any other value
+    """
+
+    def compare(first: dict[str, Any], second: dict[str, Any]) -> int:
+        for key, direction in sort_expressions:
+            first_value, second_value = get_value_by_path(first, key), get_value_by_path(second, key)
+
+            if first_value == second_value:
+                continue
+
+            is_less = first_value is None or (second_value is not None and first_value < second_value)
+            return (-1 if is_less else 1) * (1 if direction == SortDirection.ASCENDING else -1)
+
+        return 0
+
+    return sorted(documents, key=functools.cmp_to_key(compare))
+
+
+def read_all_pages(documents: list[dict[str, Any]], sort_expressions: list[tuple[str, SortDirection]], size: int):
+    sort_keys = [key for key, _ in sort_expressions]
+    pages = []
+    cursor = None
+
+    while True:
+        condition = build_keyset_condition(sort_expressions, decode_cursor(cursor, sort_keys)) if cursor else {}
+        page = sort_documents([document for document in documents if matches(document, condition)], sort_expressions)
+        page = page[:size]
+
+        if not page:
+            return pages
+
+        pages.append(page)
+        cursor = encode_cursor(sort_keys, [get_value_by_path(page[-1], key) for key in sort_keys])
+
+
+APPS = [
+    {'_id': 1, 'name': 'Portal', 'total_recommendations': 100, 'prices': {'US': {'current': {'price': 9.99}}}},
+    {'_id': 2, 'name': 'Portal 2', 'total_recommendations': 100, 'prices': {'US': {'current': {'price': None}}}},
+    {'_id': 3, 'name': 'Dota 2', 'total_recommendations': None, 'prices': {}},
+    {'_id': 4, 'name': None, 'total_recommendations': 5, 'prices': {'US': {'current': {'price': 0.0}}}},
+    {'_id': 5, 'name': 'Half-Life', 'total_recommendations': None, 'prices': {'US': {'current': {'price': 9.99}}}},
+    {'_id': 6, 'name': 'Half-Life 2', 'total_recommendations': 100, 'prices': {'US': {'current': {'price': 4.99}}}},
+    {'_id': 7, 'name': 'Team Fortress', 'total_recommendations': 5, 'prices': {'US': {'current': {'price': None}}}},
+]
+
+
+def test_cursor_round_trip_keeps_values():
+    sort_keys = ['total_recommendations', '_id']
+    cursor = encode_cursor(sort_keys, [None, 42])
+
+    assert decode_cursor(cursor, sort_keys) == [None, 42]
+
+
+def test_cursor_of_another_ordering_is_rejected():
+    cursor = encode_cursor(['name', '_id'], ['Portal', 1])
+
+    with pytest.raises(ValueError, match='another ordering'):
+        decode_cursor(cursor, ['total_recommendations', '_id'])
+
+
+@pytest.mark.parametrize('cursor', ['not a cursor', encode_cursor(['_id'], [])[:-4]])
+def test_malformed_cursor_is_rejected(cursor: str):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, ['_id'])
+
+
+def test_get_value_by_path_reads_nested_and_missing_values():
+    document = {'prices': {'US': {'current': {'price': 9.99}}}, 'developers': ['Valve']}
+
+    assert get_value_by_path(document, 'prices.US.current.price') == 9.99
+    assert get_value_by_path(document, 'developers.0') == 'Valve'
+    assert get_value_by_path(document, 'prices.DE.current.price') is None
+    assert get_value_by_path(document, 'developers.1') is None
+
+
+def test_range_condition_after_null_in_ascending_order_skips_only_nulls():
+    assert build_range_condition('name', None, SortDirection.ASCENDING) == {'name': {'$ne': None}}
+
+
+def test_range_condition_after_null_in_descending_order_is_empty():
+    # nulls are the last ones in descending order, so nothing is after them
+    assert build_range_condition('name', None, SortDirection.DESCENDING) is None
+
+
+def test_range_condition_in_descending_order_includes_nulls():
+    assert build_range_condition('name', 'Portal', SortDirection.DESCENDING) == {
+        '$or': [{'name': {'$lt': 'Portal'}}, {'name': None}]
+    }
+
+
+def test_keyset_condition_without_alternatives_matches_nothing():
+    condition = build_keyset_condition([('name', SortDirection.DESCENDING)], [None])
+
+    assert not any(matches(app, condition) for app in APPS)
+
+
+def test_tiebreaker_follows_direction_of_the_last_key():
+    query = add_tiebreaker_ordering(FakeQuery([('total_recommendations', SortDirection.DESCENDING)]))
+
+    assert query.sort_expressions == [
+        ('total_recommendations', SortDirection.DESCENDING), ('_id', SortDirection.DESCENDING)
+    ]
+
+
+def test_tiebreaker_is_not_duplicated():
+    query = add_tiebreaker_ordering(FakeQuery([('_id', SortDirection.ASCENDING)]))
+
+    assert query.sort_expressions == [('_id', SortDirection.ASCENDING)]
+
+
+@pytest.mark.parametrize('sort_expressions', [
+    [('total_recommendations', SortDirection.DESCENDING), ('_id', SortDirection.DESCENDING)],
+    [('total_recommendations', SortDirection.ASCENDING), ('_id', SortDirection.ASCENDING)],
+    [('name', SortDirection.ASCENDING), ('_id', SortDirection.ASCENDING)],
+    [('name', SortDirection.DESCENDING), ('_id', SortDirection.DESCENDING)],
+    [('prices.US.current.price', SortDirection.ASCENDING), ('_id', SortDirection.ASCENDING)],
+    [('prices.US.current.price', SortDirection.DESCENDING), ('total_recommendations', SortDirection.ASCENDING),
+     ('_id', SortDirection.DESCENDING)],
+])
+@pytest.mark.parametrize('size', [1, 2, 3])
+def test_pages_neither_overlap_nor_skip_documents(sort_expressions: list[tuple[str, SortDirection]], size: int):
+    pages = read_all_pages(APPS, sort_expressions, size)
+
+    assert [app['_id'] for page in pages for app in page] == [
+        app['_id'] for app in sort_documents(APPS, sort_expressions)
+    ]
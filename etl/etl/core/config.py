@@ -23,6 +23,7 @@ class Settings(BaseSettings):
     MONGO_PORT: int = 27017
     MONGO_DB: str = 'apps'
     MONGO_COLLECTION: str = 'apps'
+    MONGO_PRICE_HISTORY_COLLECTION: str = 'price_history'
     MONGO_USER: str = 'admin'
     MONGO_PASSWORD: str = 'admin'
 
@@ -1,4 +1,5 @@
 import logging
+from collections import defaultdict
 from datetime import timedelta
 from typing import Any, ClassVar
 
@@ -18,6 +19,29 @@ class Extractor(PipelineComponent):
     def __init__(self, db: Collection, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.db = db
+        self.price_history = db.database[settings.MONGO_PRICE_HISTORY_COLLECTION]
+
+    def attach_archived_price_points(self, apps: list[dict[str, Any]]):
+        """
+        App documents keep only the latest points of price stories, older points are archived by months
+        in the price history collection, so they are appended to the stories of the apps
+        """
+
+        archived_points = defaultdict(list)
+        archived_months = self.price_history.find({'app_id': {'$in': [app.get('_id') for app in apps]}})
+
+        for archived_month in archived_months:
+            archived_points[(archived_month['app_id'], archived_month['country_code'])].extend(
+                archived_month.get('points', [])
+            )
+
+        for app in apps:
+            for country, app_in_country in (app.get('prices') or {}).items():
+                if not (points := archived_points.get((app.get('_id'), country))):
+                    continue
+
+                points.sort(key=lambda point: point['timestamp'], reverse=True)
+                app_in_country['price_story'] = (app_in_country.get('price_story') or []) + points
 
     @backoff(start_sleep_time=5.0, max_sleep_time=60.0, logger=logger)
     def extract_from_db(self, serializer: callable):
@@ -34,6 +58,7 @@ class Extractor(PipelineComponent):
                 random_sleep(300, 1200)
                 continue
 
+            self.attach_archived_price_points(apps)
             self.logger.info(f'Successfully extracted {len(apps)} apps from DB')
             new_last_loaded = apps[-1].get('updated_at', last_loaded)
             last_loaded = new_last_loaded if new_last_loaded != last_loaded else last_loaded + timedelta(seconds=1)
@@ -1,6 +1,8 @@
 from celery import Celery
+from celery.signals import worker_process_shutdown
 
 from orchestrator.core.config import settings
+from orchestrator.messenger.connections import publisher_channel
 
 
 app = Celery(
@@ -15,3 +17,8 @@ app = Celery(
     worker_hijack_root_logger=False,
 )
 app.autodiscover_tasks(['orchestrator.celery.tasks.scheduled', 'orchestrator.celery.tasks.api'])
+
+
+@worker_process_shutdown.connect
+def close_publisher_channel(*args, **kwargs):
+    publisher_channel.close()
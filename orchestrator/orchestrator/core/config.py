@@ -20,7 +20,18 @@ class OrchestratorSettings(BaseSettings):
         CountryCodes.brazil.value,
     ]
     BATCH_SIZE_OF_UPDATING_STEAM_APPS: int = 20
-    DB_INPUT_BATCH_SIZE: int = 1000
+    APPS_LEASE_DURATION: int = 60 * 15  # seconds
+    FAILED_PAIRS_RETRY_DELAY: int = 60 * 10  # seconds
+    FAILED_PAIRS_MAX_RETRY_DELAY: int = 60 * 60 * 24 * 7  # seconds
+    REFRESH_INTERVAL: int = 60 * 60 * 6  # seconds
+    MIN_REFRESH_INTERVAL: int = 60 * 30  # seconds
+    MAX_REFRESH_INTERVAL: int = 60 * 60 * 24 * 7  # seconds
+    PRICE_VOLATILITY_DECAY: float = 0.8
+    POPULARITY_REFRESH_WEIGHT: float = 0.1
+    FREE_APPS_REFRESH_FACTOR: float = 8.0
+    UNAVAILABLE_APPS_REFRESH_FACTOR: float = 4.0
+    # apps with older metadata are requested with full details, others - only with prices
+    APPS_METADATA_REFRESH_INTERVAL: int = 60 * 60 * 24 * 7  # seconds
     DEBUG: bool = True
     API_VERSION: str = 'v1'
     TIME_ZONE: str = 'Europe/Moscow'
@@ -35,6 +46,7 @@ class OrchestratorSettings(BaseSettings):
     DB_USER: str = 'user'
     DB_PASSWORD: str = 'password'
     DB_NAME: str = 'steam_apps'
+    DB_ASYNC_POOL_SIZE: int = 8
 
     @computed_field
     @property
@@ -57,7 +69,8 @@ class OrchestratorSettings(BaseSettings):
     RABBITMQ_CONNECTION_ATTEMPTS: int = 3
     RABBITMQ_CONNECTION_RETRY_DELAY: int = 3
     RABBITMQ_HEARTBEATS_MAX_DELAY: int = 120
-    RABBITMQ_HEARTBEATS_TIMEOUT: int = 30
+    RABBITMQ_PREFETCH_COUNT: int = 8
+    RABBITMQ_PUBLISH_BATCH_SIZE: int = 100
     RABBITMQ_QUEUE_MESSAGE_TTL: int = 1000 * 60 * 60 * 24 * 7  # 7 days
 
     CELERY_NAME: str = "scheduled_tasks"
@@ -57,3 +57,9 @@ class CountryCodeSteamCurrencyMapping(Enum):
     AR = "USD"
     NO = "NOK"
     CZ = "CZK"
+
+
+class AppUpdateStatus(Enum):
+    never = "never"
+    success = "success"
+    failure = "failure"
@@ -1,2 +1,2 @@
-from .models import App
-from .connections import Session
+from .models import App, AppCountryStatus
+from .connections import Session, AsyncSession
@@ -0,0 +1,128 @@
+"""
+Benchmark of the most overdue app/country pairs selection on a growing app_country_status table:
+
+    python -m orchestrator.db.benchmark --sizes 1000000 5000000 20000000
+
+Rows are generated in a temporary table, which shadows "app_country_status" within the benchmark connection,
+so the data of the service is not touched. Everything is rolled back at the end.
+
+The apps (last_updated, id) index of the first version of the scheduler is gone: app_country_status migration
+d81a4f36c0e2 drops it, since pairs are selected from app_country_status by its next_update_at index instead.
+
+Output on PostgreSQL 16.2, 1 CPU, default batch of 140 pairs (20 apps x 7 countries), 1% of pairs leased,
+20 repeats, database migrated by "alembic -c orchestrator/db/alembic.ini upgrade head":
+
+    $ python -m orchestrator.db.benchmark --sizes 1000000 5000000 20000000
+       1000000 rows: median 0.137 ms, max 0.678 ms, plan: Limit -> LockRows -> Index Scan
+       5000000 rows: median 0.226 ms, max 1.982 ms, plan: Limit -> LockRows -> Index Scan
+      20000000 rows: median 0.188 ms, max 0.814 ms, plan: Limit -> LockRows -> Index Scan
+    $ python -m orchestrator.db.benchmark --sizes 1000000 5000000 20000000 --without-index
+       1000000 rows: median 439.842 ms, max 748.381 ms, plan: Limit -> LockRows -> Sort -> Seq Scan
+       5000000 rows: median 2595.745 ms, max 3623.333 ms, plan: Limit -> LockRows -> Sort -> Seq Scan
+      20000000 rows: median 10013.440 ms, max 18870.301 ms, plan: Limit -> LockRows -> Sort -> Seq Scan
+"""
+
+import argparse
+import statistics
+from datetime import datetime
+from typing import Any, Iterable
+
+from sqlalchemy import text, Connection
+
+from orchestrator.core.config import settings
+from .connections import engine
+from .queries import select_pairs_need_updating
+
+
+def iter_plan_node_types(plan: dict[str, Any]) -> Iterable[str]:
+    yield plan['Node Type']
+
+    for sub_plan in plan.get('Plans', []):
+        yield from iter_plan_node_types(sub_plan)
+
+
+def create_statuses_table(connection: Connection, with_index: bool):
+    connection.execute(text(
+        'CREATE TEMPORARY TABLE app_country_status (LIKE public.app_country_status INCLUDING DEFAULTS) ON COMMIT DROP'
+    ))
+    connection.execute(text('ALTER TABLE app_country_status ADD PRIMARY KEY (app_id, country_code)'))
+
+    if with_index:
+        connection.execute(text('CREATE INDEX ON app_country_status (next_update_at, app_id, country_code)'))
+
+
+def fill_statuses_table(connection: Connection, start: int, stop: int, leased_share: float):
+    connection.execute(
+        text(
+            "INSERT INTO app_country_status "
+            "(app_id, country_code, last_updated, last_status, failure_count, price_volatility, next_update_at, "
+            "leased_until) "
+            "SELECT n / :country_codes_count, "
+            "(CAST(:country_codes AS varchar[]))[n % :country_codes_count + 1], "
+            "now() - random() * interval '30 days', 'success', 0, 0, now() + (random() - 0.5) * interval '7 days', "
+            "CASE WHEN random() < :leased_share THEN now() + interval '15 minutes' END "
+            "FROM generate_series(:start, :stop) AS n"
+        ),
+        {
+            'start': start,
+            'stop': stop,
+            'leased_share': leased_share,
+            'country_codes': list(settings.DEFAULT_COUNTRY_BUNDLE),
+            'country_codes_count': len(settings.DEFAULT_COUNTRY_BUNDLE),
+        }
+    )
+    connection.execute(text('ANALYZE app_country_status'))
+
+
+def explain_selection(connection: Connection, batch_size: int) -> tuple[float, list[str]]:
+    compiled_query = select_pairs_need_updating(
+        batch_size, list(settings.DEFAULT_COUNTRY_BUNDLE), datetime.now()
+    ).compile(
+        dialect=engine.dialect, compile_kwargs={'literal_binds': True}
+    )
+    explanation = connection.exec_driver_sql(f'EXPLAIN (ANALYZE, FORMAT JSON) {compiled_query}').scalar_one()[0]
+    return explanation['Execution Time'], list(iter_plan_node_types(explanation['Plan']))
+
+
+def run_benchmark(sizes: list[int], batch_size: int, repeats: int, leased_share: float, with_index: bool):
+    with engine.connect() as connection:
+        create_statuses_table(connection, with_index)
+        filled_size = 0
+
+        for size in sorted(sizes):
+            fill_statuses_table(connection, filled_size, size - 1, leased_share)
+            filled_size = size
+
+            timings = []
+            node_types = []
+
+            for _ in range(repeats):
+                execution_time, node_types = explain_selection(connection, batch_size)
+                timings.append(execution_time)
+
+            print(
+                f'{size:>10} rows: median {statistics.median(timings):.3f} ms, '
+                f'max {max(timings):.3f} ms, plan: {" -> ".join(node_types)}'
+            )
+
+        connection.rollback()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the most overdue app/country pairs selection')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000_000, 5_000_000, 20_000_000])
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=settings.BATCH_SIZE_OF_UPDATING_STEAM_APPS * len(settings.DEFAULT_COUNTRY_BUNDLE)
+    )
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--leased-share', type=float, default=0.01)
+    parser.add_argument('--without-index', action='store_true')
+    args = parser.parse_args()
+
+    run_benchmark(args.sizes, args.batch_size, args.repeats, args.leased_share, not args.without_index)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 
 from orchestrator.core.config import settings
@@ -6,3 +7,7 @@ from orchestrator.core.config import settings
 
 engine = create_engine(settings.DB_URL)
 Session = sessionmaker(bind=engine)
+
+# psycopg 3 driver supports both modes, so the same url is used
+async_engine = create_async_engine(settings.DB_URL, pool_size=settings.DB_ASYNC_POOL_SIZE)
+AsyncSession = async_sessionmaker(bind=async_engine, expire_on_commit=False)
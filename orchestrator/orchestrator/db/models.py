@@ -1,13 +1,15 @@
 from datetime import datetime
-from typing import Annotated
+from typing import Annotated, Optional
 
-from sqlalchemy import func
+from sqlalchemy import func, Index, ForeignKey, String, Enum
 from sqlalchemy.orm import DeclarativeBase, declared_attr, Mapped, mapped_column
 
+from orchestrator.core.enums import AppUpdateStatus
+
 
 int_pk = Annotated[int, mapped_column(primary_key=True)]
 last_updated = Annotated[datetime, mapped_column(server_default=func.now(), onupdate=datetime.now)]
-lock = Annotated[bool, mapped_column(default=False)]
+lease = Annotated[Optional[datetime], mapped_column(nullable=True)]
 
 
 class Base(DeclarativeBase):
@@ -20,9 +22,47 @@ class Base(DeclarativeBase):
 
 class App(Base):
     id: Mapped[int_pk]
+    # time of the last successful update of any country of the app
     last_updated: Mapped[last_updated]
-    # TODO: Lock for parallel updating
-    # is_updating: Mapped[lock]
+    # time of the last update with full details of the app, apps without it are requested only with prices
+    metadata_updated_at: Mapped[Optional[datetime]]
+    # refresh signals, received with the latest update of the app
+    is_free: Mapped[Optional[bool]]
+    total_recommendations: Mapped[Optional[int]]
 
     def __repr__(self):
         return f'<App: id={self.id}, last updated datetime is {self.last_updated}>'
+
+
+class AppCountryStatus(Base):
+    __tablename__ = 'app_country_status'
+    __table_args__ = (
+        # most overdue pairs are read in index order, without sorting the whole table
+        Index('ix_app_country_status_next_update_at', 'next_update_at', 'app_id', 'country_code'),
+    )
+
+    app_id: Mapped[int] = mapped_column(ForeignKey('apps.id', ondelete='CASCADE'), primary_key=True)
+    country_code: Mapped[str] = mapped_column(String(2), primary_key=True)
+    # time of the last successful update, failed updates don't change it
+    last_updated: Mapped[datetime] = mapped_column(default=datetime.fromtimestamp(0))
+    last_status: Mapped[AppUpdateStatus] = mapped_column(
+        Enum(AppUpdateStatus, native_enum=False, length=16),
+        default=AppUpdateStatus.never
+    )
+    failure_count: Mapped[int] = mapped_column(default=0)
+    # refresh signals, received with the latest update of the pair
+    is_available: Mapped[Optional[bool]]
+    price: Mapped[Optional[float]]
+    discount: Mapped[Optional[int]]
+    price_volatility: Mapped[float] = mapped_column(default=0.0)
+    # computed from the refresh signals on every successful update, new pairs are due immediately
+    next_update_at: Mapped[datetime] = mapped_column(default=datetime.fromtimestamp(0))
+    # pair is requested for updating only by one scheduler until lease expires or pair is updated,
+    # failed pairs are leased until their retry time
+    leased_until: Mapped[lease]
+
+    def __repr__(self):
+        return (
+            f'<AppCountryStatus: app_id={self.app_id}, country_code={self.country_code},'
+            f' last status is {self.last_status.value}, last updated datetime is {self.last_updated}>'
+        )
@@ -0,0 +1,207 @@
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import (
+    select, update, or_, true, literal, func, column, table, case, any_,
+    Select, Update, TableClause, Boolean, DateTime, Float, Integer, String
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from orchestrator.core.config import settings
+from orchestrator.core.enums import AppUpdateStatus
+from .models import App, AppCountryStatus
+from .scoring import build_price_volatility_expression, build_refresh_interval_expression
+
+
+REFRESH_SIGNALS_COLUMNS = {
+    'app_id': Integer,
+    'country_code': String,
+    'updated_at': DateTime,
+    'is_available': Boolean,
+    'price': Float,
+    'discount': Integer,
+    'is_free': Boolean,
+    'total_recommendations': Integer,
+    'is_metadata_updated': Boolean,
+}
+
+
+def select_apps_with_outdated_metadata(app_ids: list[int], now: datetime) -> Select:
+    return (
+        select(App.id)
+        .where(
+            App.id == any_(literal(app_ids, ARRAY(Integer))),
+            or_(
+                App.metadata_updated_at.is_(None),
+                App.metadata_updated_at < now - timedelta(seconds=settings.APPS_METADATA_REFRESH_INTERVAL)
+            )
+        )
+    )
+
+
+def select_pairs_need_updating(batch_size: int, country_codes: list[str], now: datetime) -> Select:
+    """
+    Most overdue pairs go first. Order matches ix_app_country_status_next_update_at,
+    so postgres reads the index from the start and stops after batch_size due unleased pairs
+    instead of sorting the whole table
+    """
+
+    return (
+        select(AppCountryStatus.app_id, AppCountryStatus.country_code)
+        .where(
+            AppCountryStatus.next_update_at <= now,
+            AppCountryStatus.country_code.in_(country_codes),
+            or_(AppCountryStatus.leased_until.is_(None), AppCountryStatus.leased_until < now)
+        )
+        .order_by(AppCountryStatus.next_update_at, AppCountryStatus.app_id, AppCountryStatus.country_code)
+        .limit(batch_size)
+        # rows claimed by concurrent schedulers are skipped instead of waiting for their transactions
+        .with_for_update(skip_locked=True)
+    )
+
+
+async def copy_app_ids_into_temporary_table(
+        session: AsyncSession,
+        table_name: str,
+        app_ids: Iterable[int]
+) -> TableClause:
+    """
+    Ids are streamed with COPY, which is much faster than inserting them with parameters.
+    Table lives until the end of the transaction of the session.
+    """
+
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+
+    async with raw_connection.driver_connection.cursor() as cursor:
+        await cursor.execute(f'CREATE TEMPORARY TABLE {table_name} (id integer PRIMARY KEY) ON COMMIT DROP')
+
+        async with cursor.copy(f'COPY {table_name} (id) FROM STDIN') as copy:
+            for app_id in app_ids:
+                await copy.write_row((app_id,))
+
+    return table(table_name, column('id'))
+
+
+def insert_new_apps(app_ids_table: TableClause, country_codes: list[str]) -> Select:
+    """
+    Inserts apps missing in the table together with statuses of their countries in a single statement,
+    returns ids of the inserted apps
+    """
+
+    new_apps = (
+        insert(App)
+        .from_select(['id', 'last_updated'], select(app_ids_table.c.id, literal(datetime.fromtimestamp(0))))
+        .on_conflict_do_nothing(index_elements=[App.id])
+        .returning(App.id)
+        .cte('new_apps')
+    )
+    country_codes_table = (
+        func.unnest(literal(country_codes, ARRAY(String))).table_valued('country_code').render_derived()
+    )
+    # defaults of columns aren't applied to inserts nested into CTE, so they are selected explicitly
+    defaulted_columns = [
+        status_column for status_column in AppCountryStatus.__table__.c if status_column.default is not None
+    ]
+    new_statuses = (
+        insert(AppCountryStatus)
+        .from_select(
+            ['app_id', 'country_code', *(status_column.name for status_column in defaulted_columns)],
+            select(
+                new_apps.c.id,
+                country_codes_table.c.country_code,
+                *(literal(status_column.default.arg, status_column.type) for status_column in defaulted_columns)
+            )
+            .join(country_codes_table, true())
+        )
+        .cte('new_statuses')
+    )
+    return select(new_apps.c.id).add_cte(new_statuses)
+
+
+def update_pairs_by_refresh_signals(refresh_signals: list[dict[str, Any]]) -> Update:
+    """
+    Updates statuses of all pairs and their apps by a single statement regardless of the amount of pairs:
+    signals are passed as arrays and unnested into rows on the db side.
+    Apps are updated in a data-modifying CTE, so pairs are scored with the previous signals of apps,
+    unless the new ones are received.
+    Signals of pairs without status row are not applied, so the updated pairs are returned.
+    """
+
+    signals_arrays = (
+        literal([pair_signals.get(name) for pair_signals in refresh_signals], ARRAY(column_type))
+        for name, column_type in REFRESH_SIGNALS_COLUMNS.items()
+    )
+    signals = (
+        select(
+            func.unnest(*signals_arrays)
+            .table_valued(*(column(name, column_type) for name, column_type in REFRESH_SIGNALS_COLUMNS.items()))
+            .render_derived()
+        )
+        .cte('signals')
+    )
+
+    apps_signals = (
+        select(
+            signals.c.app_id,
+            func.max(signals.c.updated_at).label('updated_at'),
+            func.max(
+                case((signals.c.is_metadata_updated.is_(True), signals.c.updated_at))
+            ).label('metadata_updated_at'),
+            func.bool_or(signals.c.is_free).label('is_free'),
+            func.max(signals.c.total_recommendations).label('total_recommendations'),
+        )
+        .group_by(signals.c.app_id)
+        .subquery('apps_signals')
+    )
+    updated_apps = (
+        update(App)
+        .where(App.id == apps_signals.c.app_id)
+        .values(
+            last_updated=apps_signals.c.updated_at,
+            metadata_updated_at=func.coalesce(apps_signals.c.metadata_updated_at, App.metadata_updated_at),
+            is_free=func.coalesce(apps_signals.c.is_free, App.is_free),
+            total_recommendations=func.coalesce(apps_signals.c.total_recommendations, App.total_recommendations),
+        )
+        .returning(App.id)
+        .cte('updated_apps')
+    )
+
+    # previous price of the pair is read from the row being updated
+    price_volatility = build_price_volatility_expression(
+        AppCountryStatus.price_volatility,
+        AppCountryStatus.price,
+        AppCountryStatus.discount,
+        signals.c.price,
+        signals.c.discount
+    )
+    refresh_interval = build_refresh_interval_expression(
+        price_volatility,
+        signals.c.is_available,
+        func.coalesce(signals.c.is_free, App.is_free),
+        func.coalesce(signals.c.total_recommendations, App.total_recommendations)
+    )
+    return (
+        update(AppCountryStatus)
+        .where(
+            AppCountryStatus.app_id == signals.c.app_id,
+            AppCountryStatus.country_code == signals.c.country_code,
+            App.id == signals.c.app_id,
+        )
+        .values(
+            last_updated=signals.c.updated_at,
+            last_status=AppUpdateStatus.success,
+            failure_count=0,
+            leased_until=None,
+            is_available=signals.c.is_available,
+            price=func.coalesce(signals.c.price, AppCountryStatus.price),
+            discount=func.coalesce(signals.c.discount, AppCountryStatus.discount),
+            price_volatility=price_volatility,
+            next_update_at=signals.c.updated_at + func.make_interval(0, 0, 0, 0, 0, 0, refresh_interval),
+        )
+        .add_cte(updated_apps)
+        .returning(AppCountryStatus.app_id, AppCountryStatus.country_code)
+        .execution_options(synchronize_session=False)
+    )
@@ -0,0 +1,44 @@
+from sqlalchemy import ColumnElement, case, func, and_, or_, literal
+
+from orchestrator.core.config import settings
+
+
+def build_price_volatility_expression(
+        price_volatility: ColumnElement,
+        previous_price: ColumnElement,
+        previous_discount: ColumnElement,
+        price: ColumnElement,
+        discount: ColumnElement
+) -> ColumnElement:
+    """
+    Exponentially decayed number of price changes: every update multiplies it by PRICE_VOLATILITY_DECAY
+    and every observed change of price or discount adds one
+    """
+
+    is_price_changed = and_(
+        previous_price.is_not(None),
+        price.is_not(None),
+        or_(previous_price != price, previous_discount.is_distinct_from(discount))
+    )
+    return price_volatility * settings.PRICE_VOLATILITY_DECAY + case((is_price_changed, 1.0), else_=0.0)
+
+
+def build_refresh_interval_expression(
+        price_volatility: ColumnElement,
+        is_available: ColumnElement,
+        is_free: ColumnElement,
+        total_recommendations: ColumnElement
+) -> ColumnElement:
+    """
+    Seconds until the next update of the app in the country. Volatile and popular apps are updated more often,
+    free apps and apps unavailable in the country - less often.
+    """
+
+    popularity = 1 + settings.POPULARITY_REFRESH_WEIGHT * func.ln(1 + func.coalesce(total_recommendations, 0))
+    refresh_interval = (
+        literal(float(settings.REFRESH_INTERVAL))
+        / ((1 + price_volatility) * popularity)
+        * case((is_free.is_(True), settings.FREE_APPS_REFRESH_FACTOR), else_=1.0)
+        * case((is_available.is_(False), settings.UNAVAILABLE_APPS_REFRESH_FACTOR), else_=1.0)
+    )
+    return func.greatest(settings.MIN_REFRESH_INTERVAL, func.least(settings.MAX_REFRESH_INTERVAL, refresh_interval))
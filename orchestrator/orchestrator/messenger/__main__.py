@@ -1,70 +1,48 @@
-import threading
-import time
+import asyncio
 
-from pika.adapters.blocking_connection import BlockingChannel
-from pika.exceptions import AMQPConnectionError, ChannelWrongStateError
-from pika.spec import Basic, BasicProperties
+from aio_pika.abc import AbstractIncomingMessage
 
 from orchestrator.core.config import settings
 from orchestrator.core.logger import get_logger
-from orchestrator.db import Session
-from .connections import create_channel
+from orchestrator.db import AsyncSession
+from orchestrator.db.connections import async_engine
+from .connections import create_async_channel
 from .tasks import TaskManager
-from .utils import HandledException
 from .logger import base_logger
 
 
-def consume_messages():
+async def consume_messages():
     consuming_messages_logger = get_logger(settings, name='messenger.received_worker_task')
-    worker_channel, broker_connection = create_channel()
+    worker_channel, broker_connection = await create_async_channel()
 
+    # tasks received from worker don't send new tasks, so messenger channel for publishing isn't required
     task_manager = TaskManager(
-        messenger_channel=worker_channel,
-        session_maker=Session,
+        messenger_channel=None,
+        async_session_maker=AsyncSession,
         logger=consuming_messages_logger
     )
+    stop_consuming_messages = asyncio.Event()
 
-    def handle_income_task(ch: BlockingChannel, method: Basic.Deliver, properties: BasicProperties, body: bytes):
-        # threading.Thread(target=task_manager.handle_received_task_message, args=(ch, method, properties, body)).start()
-        task_manager.handle_received_task_message(ch, method, properties, body)
-
-    worker_channel.basic_consume(queue=settings.RABBITMQ_INCOME_QUERY, on_message_callback=handle_income_task)
-
-    # TODO: run task in new thread & control it amount (semaphore?)
-    def process_events(stop_consuming_messages_: threading.Event):
-        while not stop_consuming_messages_.is_set():
-            time.sleep(settings.RABBITMQ_HEARTBEATS_TIMEOUT)
-            worker_channel.connection.process_data_events()
-
-    stop_consuming_messages = threading.Event()
-    heartbeat_thread = threading.Thread(target=process_events, args=(stop_consuming_messages,), daemon=True)
-    heartbeat_thread.start()
-
-    while True:
+    # up to RABBITMQ_PREFETCH_COUNT messages are handled concurrently, every one in its own asyncio task
+    async def handle_income_task(message: AbstractIncomingMessage):
         try:
-            worker_channel.start_consuming()
-
-        except HandledException:
-            worker_channel.stop_consuming()
-
-        except ChannelWrongStateError:
-            base_logger.warning(f"Broker channel closed. Reopening...")
-            broker_connection.close()
-            worker_channel, broker_connection = create_channel()
-
-        except AMQPConnectionError:
-            base_logger.warning(f"Connection to broker lost. Reconnecting...")
-            broker_connection.close()
-            time.sleep(5)
-            worker_channel, broker_connection = create_channel()
+            await task_manager.handle_received_task_message(message)
 
         except Exception as unhandled_critical_error:
             base_logger.critical(f"An unhandled exception received. Exception: {unhandled_critical_error}")
             stop_consuming_messages.set()
-            worker_channel.stop_consuming()
-            broker_connection.close()
-            break
+
+    income_queue = await worker_channel.get_queue(settings.RABBITMQ_INCOME_QUERY)
+    await income_queue.consume(handle_income_task)
+
+    try:
+        await stop_consuming_messages.wait()
+
+    finally:
+        # unacknowledged messages of interrupted tasks are returned to the queue by broker
+        await broker_connection.close()
+        await async_engine.dispose()
 
 
 if __name__ == '__main__':
-    consume_messages()
+    asyncio.run(consume_messages())
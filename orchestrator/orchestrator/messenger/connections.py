@@ -1,9 +1,57 @@
+import os
+import threading
+from typing import Optional
+
+import aio_pika
 import pika
-from pika.exceptions import AMQPConnectionError
+from aio_pika.abc import AbstractRobustChannel, AbstractRobustConnection
+from pika.exceptions import (
+    AMQPConnectionError, AMQPChannelError, ChannelWrongStateError, ConnectionWrongStateError, NackError
+)
 
 from orchestrator.core.config import settings
 
 
+class BatchConfirmations:
+    """
+    Positions of the published batch messages by delivery tags of the confirm-mode channel.
+    Broker numbers messages of the channel sequentially, so the published message gets the next tag.
+    """
+
+    def __init__(self):
+        self.last_delivery_tag = 0
+        self.unconfirmed_positions: dict[int, int] = {}
+        self.confirmed_positions: set[int] = set()
+        self.nacked_positions: set[int] = set()
+
+    def start_batch(self):
+        self.unconfirmed_positions.clear()
+        self.confirmed_positions.clear()
+        self.nacked_positions.clear()
+
+    def add(self, position: int):
+        self.last_delivery_tag += 1
+        self.unconfirmed_positions[self.last_delivery_tag] = position
+
+    def confirm(self, method_frame: pika.frame.Method):
+        method = method_frame.method
+
+        if method.multiple:
+            delivery_tags = [tag for tag in self.unconfirmed_positions if tag <= method.delivery_tag]
+        else:
+            delivery_tags = [method.delivery_tag] if method.delivery_tag in self.unconfirmed_positions else []
+
+        positions = {self.unconfirmed_positions.pop(tag) for tag in delivery_tags}
+        self.confirmed_positions |= positions
+
+        if isinstance(method, pika.spec.Basic.Nack):
+            self.nacked_positions |= positions
+
+    @property
+    def is_confirmed(self) -> bool:
+        return not self.unconfirmed_positions
+
+
 def create_channel() -> tuple[pika.adapters.blocking_connection.BlockingChannel, pika.BlockingConnection]:
     def connect() -> pika.BlockingConnection:
         attempt = 0
@@ -39,3 +87,181 @@ def create_channel() -> tuple[pika.adapters.blocking_connection.BlockingChannel,
     new_channel.queue_declare(queue=settings.RABBITMQ_OUTCOME_QUERY, durable=True, arguments=channel_args)
     new_channel.basic_qos(prefetch_count=1)
     return new_channel, new_connection
+
+
+class PublisherChannel:
+    """
+    Lazily opened blocking channel, reused by all tasks published from the process.
+    Channel is in confirm mode, so publishing returns only after broker has accepted the message.
+    Broken connection (e.g. closed by broker after missed heartbeats of idle process) is reopened on publishing.
+    """
+
+    def __init__(self):
+        self._channel: Optional[pika.adapters.blocking_connection.BlockingChannel] = None
+        self._batch_channel: Optional[pika.adapters.blocking_connection.BlockingChannel] = None
+        self._batch_confirmations = BatchConfirmations()
+        self._connection: Optional[pika.BlockingConnection] = None
+        self._owner_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return (
+            self._channel is not None
+            and self._channel.is_open
+            and self._connection.is_open
+            # Celery prefork pool forks processes after the channel is created,
+            # so each process must have its own connection
+            and self._owner_pid == os.getpid()
+        )
+
+    @property
+    def channel(self) -> pika.adapters.blocking_connection.BlockingChannel:
+        if not self.is_open:
+            self._open()
+
+        return self._channel
+
+    @property
+    def batch_channel(self) -> pika.adapters.blocking_connection.BlockingChannel:
+        """
+        Blocking channel waits for the confirmation of every message right after its publishing,
+        so batches are published by the underlying asynchronous channel, which reports confirmations to
+        the callback and lets wait for the whole batch once
+        """
+
+        if not self.is_open:
+            self._open()
+
+        if self._batch_channel is None or not self._batch_channel.is_open:
+            batch_channel = self._connection.channel()
+            confirmations = BatchConfirmations()
+            is_selected = []
+
+            batch_channel._impl.confirm_delivery(
+                ack_nack_callback=confirmations.confirm,
+                callback=lambda _method_frame: is_selected.append(True)
+            )
+            batch_channel._flush_output(lambda: bool(is_selected))
+            self._batch_channel, self._batch_confirmations = batch_channel, confirmations
+
+        return self._batch_channel
+
+    def _open(self):
+        self.close()
+        self._channel, self._connection = create_channel()
+        self._channel.confirm_delivery()
+        self._owner_pid = os.getpid()
+
+    def basic_publish(self, exchange: str, routing_key: str, body: str | bytes, properties: pika.BasicProperties):
+        """
+        Same signature as BlockingChannel.basic_publish, so the channel can be passed to TaskManager as is.
+        Raises pika.exceptions.NackError if broker has not accepted the message.
+        """
+
+        with self._lock:
+            try:
+                self.channel.basic_publish(exchange=exchange, routing_key=routing_key, body=body, properties=properties)
+
+            except (AMQPConnectionError, AMQPChannelError, ChannelWrongStateError, ConnectionWrongStateError):
+                # message is not confirmed, so it's published again once
+                self._open()
+                self.channel.basic_publish(exchange=exchange, routing_key=routing_key, body=body, properties=properties)
+
+    def _publish_batch(
+            self,
+            exchange: str,
+            routing_key: str,
+            bodies: list[str | bytes],
+            properties: pika.BasicProperties
+    ):
+        # reopened channel starts with empty confirmations as well
+        self._batch_confirmations.start_batch()
+        channel = self.batch_channel
+
+        for position, body in enumerate(bodies):
+            self._batch_confirmations.add(position)
+            channel._impl.basic_publish(exchange=exchange, routing_key=routing_key, body=body, properties=properties)
+
+        channel._flush_output(lambda: self._batch_confirmations.is_confirmed)
+
+        if self._batch_confirmations.nacked_positions:
+            raise NackError([])
+
+    def basic_publish_batch(
+            self,
+            exchange: str,
+            routing_key: str,
+            bodies: list[str | bytes],
+            properties: pika.BasicProperties
+    ):
+        """
+        Whole batch is published before waiting, so confirmations of the broker are awaited once per batch.
+        Raises pika.exceptions.NackError if broker has not accepted any message of the batch.
+        """
+
+        with self._lock:
+            try:
+                self._publish_batch(exchange, routing_key, bodies, properties)
+
+            except (AMQPConnectionError, AMQPChannelError, ChannelWrongStateError, ConnectionWrongStateError):
+                # only unconfirmed messages are published again once
+                confirmed_positions = self._batch_confirmations.confirmed_positions
+                unconfirmed_bodies = [
+                    body for position, body in enumerate(bodies) if position not in confirmed_positions
+                ]
+                self._open()
+                self._publish_batch(exchange, routing_key, unconfirmed_bodies, properties)
+
+    def close(self):
+        if self._connection is not None and self._connection.is_open and self._owner_pid == os.getpid():
+            try:
+                self._connection.close()
+
+            except (AMQPConnectionError, ConnectionWrongStateError):
+                pass
+
+        self._channel = None
+        self._batch_channel = None
+        self._batch_confirmations = BatchConfirmations()
+        self._connection = None
+        self._owner_pid = None
+
+
+publisher_channel = PublisherChannel()
+
+
+async def create_async_channel() -> tuple[AbstractRobustChannel, AbstractRobustConnection]:
+    """
+    Robust connection restores the channel, declared queues and consumers after reconnection by itself
+    """
+
+    attempt = 0
+
+    while True:
+        try:
+            new_connection = await aio_pika.connect_robust(
+                host=settings.RABBITMQ_HOST,
+                port=settings.RABBITMQ_PORT,
+                login=settings.RABBITMQ_USER,
+                password=settings.RABBITMQ_PASSWORD,
+                heartbeat=settings.RABBITMQ_HEARTBEATS_MAX_DELAY,
+                reconnect_interval=settings.RABBITMQ_CONNECTION_RETRY_DELAY,
+            )
+            break
+
+        except (ConnectionError, aio_pika.exceptions.AMQPConnectionError) as error:
+            attempt += 1
+
+            if attempt >= settings.RABBITMQ_CONNECTION_ATTEMPTS:
+                raise error
+
+    new_channel = await new_connection.channel()
+    channel_args = {
+        'x-max-priority': 5,
+        'x-message-ttl': settings.RABBITMQ_QUEUE_MESSAGE_TTL,
+    }
+    await new_channel.declare_queue(settings.RABBITMQ_INCOME_QUERY, durable=True, arguments=channel_args)
+    await new_channel.declare_queue(settings.RABBITMQ_OUTCOME_QUERY, durable=True, arguments=channel_args)
+    await new_channel.set_qos(prefetch_count=settings.RABBITMQ_PREFETCH_COUNT)
+    return new_channel, new_connection
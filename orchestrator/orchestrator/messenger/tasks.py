@@ -1,22 +1,36 @@
 import asyncio
 import functools
 import json
-from collections.abc import Iterable
-from datetime import datetime
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from logging import Logger
 from typing import Optional, Any
 
 import pika
+from aio_pika.abc import AbstractIncomingMessage
 from pika.adapters.blocking_connection import BlockingChannel
-from pika.spec import Basic, BasicProperties
-from sqlalchemy import select, insert, update
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update, delete, tuple_, func, literal, any_, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
 
 from orchestrator.core.config import settings
 from orchestrator.core.logger import get_logger
-from orchestrator.db import App
+from orchestrator.core.enums import AppUpdateStatus
+from orchestrator.db import App, AppCountryStatus
+from orchestrator.db.queries import (
+    select_pairs_need_updating,
+    select_apps_with_outdated_metadata,
+    copy_app_ids_into_temporary_table,
+    insert_new_apps,
+    update_pairs_by_refresh_signals,
+)
+from orchestrator.db.scoring import build_refresh_interval_expression
 
-from .utils import trace_logs, HandledException, batch_slicer
+from .connections import PublisherChannel
+from .utils import trace_logs, HandledException, batch_slicer, parse_backend_timestamp
 
 
 class TaskManagerMeta(type):
@@ -32,16 +46,65 @@ class TaskManagerMeta(type):
         return new_class
 
 
+class TasksBatch:
+    def __init__(self, task_manager: 'TaskManager', max_size: int = settings.RABBITMQ_PUBLISH_BATCH_SIZE):
+        self.task_manager = task_manager
+        self.max_size = max_size
+        self._payloads: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+    def register_task(self, task_context: dict[str, Any]):
+        self._payloads.append(json.dumps(task_context))
+
+        if len(self._payloads) >= self.max_size:
+            self.flush()
+
+    def flush(self):
+        if not self._payloads:
+            return
+
+        messenger_channel = self.task_manager.messenger_channel
+
+        if not messenger_channel:
+            self.task_manager.logger.error('Cannot register tasks - messenger channel is not initialized')
+            return
+
+        payloads, self._payloads = self._payloads, []
+        properties = self.task_manager.build_message_properties()
+
+        if isinstance(messenger_channel, PublisherChannel):
+            messenger_channel.basic_publish_batch(
+                exchange='',
+                routing_key=settings.RABBITMQ_OUTCOME_QUERY,
+                bodies=payloads,
+                properties=properties
+            )
+            return
+
+        for payload in payloads:
+            messenger_channel.basic_publish(
+                exchange='',
+                routing_key=settings.RABBITMQ_OUTCOME_QUERY,
+                body=payload,
+                properties=properties
+            )
+
+
 # TODO: Separate task logic from messenger utility
 class TaskManager(metaclass=TaskManagerMeta):
     def __init__(
-            self, messenger_channel: Optional[BlockingChannel],
-            session_maker: Session,
+            self, messenger_channel: Optional[BlockingChannel | PublisherChannel],
+            session_maker: Optional[sessionmaker] = None,
+            async_session_maker: Optional[async_sessionmaker] = None,
             logger: Logger = None,
             send_msg_with_priority: int = 1
     ):
         self.messenger_channel = messenger_channel
+        # sync sessions are used by tasks sent from celery, async ones - by tasks received from worker
         self.db_session_maker = session_maker
+        self.async_db_session_maker = async_session_maker
         self.logger = logger if logger else get_logger(settings, __name__)
         self.send_msg_with_priority = send_msg_with_priority
 
@@ -56,6 +119,12 @@ class TaskManager(metaclass=TaskManagerMeta):
     def get_receive_task_handler(self, task_name: str) -> Optional[callable]:
         return self._receive_tasks.get(task_name)
 
+    def build_message_properties(self) -> pika.BasicProperties:
+        return pika.BasicProperties(
+            delivery_mode=pika.DeliveryMode.Persistent,
+            priority=self.send_msg_with_priority
+        )
+
     def register_task(self, task_context: dict[str, Any]):
         if not self.messenger_channel:
             self.logger.error('Cannot register task - messenger channel is not initialized')
@@ -66,59 +135,63 @@ class TaskManager(metaclass=TaskManagerMeta):
             exchange='',
             routing_key=settings.RABBITMQ_OUTCOME_QUERY,
             body=context_json_payload,
-            properties=pika.BasicProperties(
-                delivery_mode=pika.DeliveryMode.Persistent,
-                priority=self.send_msg_with_priority
-            )
+            properties=self.build_message_properties()
         )
 
-    def handle_received_task_message(
-            self,
-            ch: BlockingChannel,
-            method: pika.spec.Basic.Deliver,
-            properties: pika.spec.BasicProperties,
-            body: bytes
-    ):
-        data = json.loads(body)
+    @contextmanager
+    def batched_publishing(self) -> Iterator['TasksBatch']:
+        """
+        Tasks registered in the batch are published together when the batch overflows and on exit from the context.
+        Tasks left in the batch are discarded if an exception is raised within the context.
+        """
+
+        tasks_batch = TasksBatch(self)
+        yield tasks_batch
+        tasks_batch.flush()
+
+    async def handle_received_task_message(self, message: AbstractIncomingMessage):
+        data = json.loads(message.body)
 
         if not (requested_task_name := data.get('task_name')):
             # TODO: id of message & logging it (broker deletes messages - save wrong messages for debug?)
             self.logger.error('Message received from worker doesnt contain "task_name". Message discarded.')
-            ch.basic_reject(delivery_tag=method.delivery_tag, requeue=False)
+            await message.reject(requeue=False)
             return
 
         if not (handle_received_task := self.get_receive_task_handler(requested_task_name)):
             self.logger.error(f'Message received from worker contains an invalid task name '
                               f'- a task named "{requested_task_name}" does not exist. Message discarded.')
-            ch.basic_reject(delivery_tag=method.delivery_tag, requeue=False)
+            await message.reject(requeue=False)
             return
 
         try:
             task_params = data.get('params', {})
-            handle_received_task(self, ch, method, properties, task_params)
+            await handle_received_task(self, message, task_params)
 
         except TypeError:
             error_msg = f'The parameters passed to the task "{requested_task_name}" do not match its signature'
             self.logger.error(error_msg)
-            ch.basic_reject(delivery_tag=method.delivery_tag, requeue=False)
+            await message.reject(requeue=False)
 
         except HandledException:
-            ch.basic_reject(delivery_tag=method.delivery_tag, requeue=False)
+            await message.reject(requeue=False)
 
         except Exception as unhandled_error:
             error_msg = f'Task "{requested_task_name}" execution failed with error: {unhandled_error}'
             self.logger.error(error_msg)
-            ch.basic_reject(delivery_tag=method.delivery_tag, requeue=False)
+            await message.reject(requeue=False)
 
         else:
-            ch.basic_ack(delivery_tag=method.delivery_tag)
+            await message.ack()
 
     @trace_logs
-    def request_apps_list(self):
+    def request_apps_list(self, full_reconciliation: bool = False):
         # TODO: Worker tasks registry
         task_context = {
             "task_name": "request_apps_list",
-            "params": {}
+            "params": {
+                "full_reconciliation": full_reconciliation
+            }
         }
         self.register_task(task_context)
 
@@ -135,14 +208,17 @@ class TaskManager(metaclass=TaskManagerMeta):
 
     @trace_logs
     def bulk_request_for_apps_data(self, app_ids: list[str], country_codes: list[str]):
-        task_context = {
-            "task_name": "bulk_request_for_apps_data",
-            "params": {
-                "app_ids": app_ids,
-                "country_codes": country_codes
-            }
-        }
-        self.register_task(task_context)
+        # apps are split into separate tasks, so they can be handled by different worker replicas
+        with self.batched_publishing() as tasks_batch:
+            for batch_of_ids in batch_slicer(app_ids, settings.BATCH_SIZE_OF_UPDATING_STEAM_APPS):
+                task_context = {
+                    "task_name": "bulk_request_for_apps_data",
+                    "params": {
+                        "app_ids": batch_of_ids,
+                        "country_codes": country_codes
+                    }
+                }
+                tasks_batch.register_task(task_context)
 
     @trace_logs
     def bulk_request_for_most_outdated_apps_data(
@@ -150,79 +226,161 @@ class TaskManager(metaclass=TaskManagerMeta):
             batch_size: int = settings.BATCH_SIZE_OF_UPDATING_STEAM_APPS,
             country_codes: list[str] = settings.DEFAULT_COUNTRY_BUNDLE
     ):
-        def get_apps_need_updating() -> Iterable[int]:
+        def claim_pairs_need_updating() -> tuple[list[tuple[int, str]], set[int]]:
+            now = datetime.now()
+            pairs_need_updating = select_pairs_need_updating(batch_size * len(country_codes), country_codes, now)
             query = (
-                select(App.id)
-                .order_by(App.last_updated)
-                .limit(batch_size)
+                update(AppCountryStatus)
+                .where(tuple_(AppCountryStatus.app_id, AppCountryStatus.country_code).in_(pairs_need_updating))
+                .values(leased_until=now + timedelta(seconds=settings.APPS_LEASE_DURATION))
+                .returning(AppCountryStatus.app_id, AppCountryStatus.country_code)
+                .execution_options(synchronize_session=False)
             )
 
             with self.db_session_maker() as session:
-                return list(session.execute(query).scalars().all())
+                claimed_pairs = [tuple(pair) for pair in session.execute(query).all()]
+                session.commit()
 
-        app_ids = get_apps_need_updating()
+                if not claimed_pairs:
+                    return [], set()
 
-        task_context = {
-            "task_name": "bulk_request_for_apps_data",
-            "params": {
-                "app_ids": app_ids,
-                "country_codes": country_codes
-            }
-        }
-        self.register_task(task_context)
+                claimed_app_ids = list({app_id for app_id, _ in claimed_pairs})
+                outdated_app_ids = set(
+                    session.scalars(select_apps_with_outdated_metadata(claimed_app_ids, now)).all()
+                )
+                return claimed_pairs, outdated_app_ids
 
+        pairs, outdated_metadata_app_ids = claim_pairs_need_updating()
+
+        if not pairs:
+            self.logger.info('All outdated apps are already requested for updating')
+            return
+
+        # only stale countries of the app are requested, so pairs are grouped by country
+        app_ids_by_country_code = defaultdict(list)
+
+        for app_id, country_code in pairs:
+            app_ids_by_country_code[country_code].append(app_id)
+
+        # prices of apps are requested from steam in batches, only apps with outdated metadata
+        # are requested with full details one by one
+        with self.batched_publishing() as tasks_batch:
+            for country_code, app_ids in app_ids_by_country_code.items():
+                task_context = {
+                    "task_name": "bulk_request_for_apps_prices",
+                    "params": {
+                        "app_ids": app_ids,
+                        "country_codes": [country_code],
+                        "outdated_app_ids": [app_id for app_id in app_ids if app_id in outdated_metadata_app_ids]
+                    }
+                }
+                tasks_batch.register_task(task_context)
 
     @trace_logs
-    def receive_task__actualize_app_list(
-            self,
-            ch: BlockingChannel,
-            method: Basic.Deliver,
-            properties: BasicProperties,
-            task_params: dict[str, Any]
-    ):
-        if not (app_ids := task_params.get('app_ids')):
-            error_msg = 'Task "actualize_app_list": No app_ids provided in task context'
+    async def receive_task__actualize_app_list(self, message: AbstractIncomingMessage, task_params: dict[str, Any]):
+        app_ids = task_params.get('app_ids')
+        removed_app_ids = task_params.get('removed_app_ids')
+
+        if not (app_ids or removed_app_ids):
+            error_msg = 'Task "actualize_app_list": No app_ids or removed_app_ids provided in task context'
             self.logger.error(error_msg)
             raise HandledException(error_msg)
 
-        actual_ids = set(app_ids)
-        existing_ids_query = select(App.id)
+        async with self.async_db_session_maker() as session:  # noqa: E701
+            if app_ids:
+                # chunk of ids is copied into temporary table and new apps are inserted by a single statement,
+                # so existing ids aren't loaded from db
+                app_ids_table = await copy_app_ids_into_temporary_table(session, 'actual_app_ids', set(app_ids))
+                new_app_ids = (
+                    await session.scalars(insert_new_apps(app_ids_table, settings.DEFAULT_COUNTRY_BUNDLE))
+                ).all()
+                self.logger.debug(f'Task "actualize_app_list": received {len(new_app_ids)} new apps')
 
-        with self.db_session_maker() as session:  # noqa: E701
-            existing_ids = {row[0] for row in session.execute(existing_ids_query)}
-            new_ids = list(actual_ids - existing_ids)
-            self.logger.debug(f'Task "actualize_app_list": received {len(new_ids)} new apps')
+            if removed_app_ids:
+                self.logger.debug(f'Task "actualize_app_list": received {len(removed_app_ids)} removed apps')
+                # statuses of countries are removed by cascade
+                await session.execute(delete(App).where(App.id == any_(literal(removed_app_ids, ARRAY(Integer)))))
 
-            for batch_of_ids in batch_slicer(new_ids, settings.DB_INPUT_BATCH_SIZE):
-                query = insert(App).values(
-                    [{"id": app_id, "last_updated": datetime.fromtimestamp(0)} for app_id in batch_of_ids]
-                )
-                session.execute(query)
-                session.commit()
+            await session.commit()
 
     @trace_logs
-    def receive_task__update_apps_status(
-            self,
-            ch: BlockingChannel,
-            method: Basic.Deliver,
-            properties: BasicProperties,
-            task_params: dict[str, Any]
-    ):
-        if not (app_ids := task_params.get('app_ids')):
-            error_msg = 'Task "actualize_app_list": No app_ids provided in task context'
+    async def receive_task__update_apps_status(self, message: AbstractIncomingMessage, task_params: dict[str, Any]):
+        # every updated pair is a dict with app_id, country_code and refresh signals received by worker
+        updated_pairs = task_params.get('updated_pairs', [])
+        failed_pairs = [tuple(pair) for pair in task_params.get('failed_pairs', [])]
+        # all countries of the apps are considered updated, as it was before per-country statuses
+        app_ids = task_params.get('app_ids', [])
+
+        if not (updated_pairs or failed_pairs or app_ids):
+            error_msg = 'Task "update_apps_status": No updated_pairs, failed_pairs or app_ids provided in task context'
             self.logger.error(error_msg)
             raise HandledException(error_msg)
 
-        with self.db_session_maker() as session:  # noqa: E701
-            for batch_of_ids in batch_slicer(app_ids, settings.DB_INPUT_BATCH_SIZE):
-                query = (
+        now = datetime.now()
+
+        for pair_signals in updated_pairs:
+            # backend time is used, so freshness order matches the order in which packages were applied
+            pair_signals['updated_at'] = parse_backend_timestamp(pair_signals.get('updated_at')) or now
+
+        async with self.async_db_session_maker() as session:  # noqa: E701
+            if updated_pairs:
+                applied_pairs = set((await session.execute(update_pairs_by_refresh_signals(updated_pairs))).tuples())
+                # e.g. pairs of apps removed during the update or of countries missing in the bundle
+                skipped_pairs = {
+                    (pair_signals['app_id'], pair_signals['country_code']) for pair_signals in updated_pairs
+                } - applied_pairs
+
+                if skipped_pairs:
+                    self.logger.warning(
+                        f'Task "update_apps_status": {len(skipped_pairs)} updated pairs have no status'
+                        f' and are skipped: {sorted(skipped_pairs)[:10]}'
+                    )
+
+            if app_ids:
+                legacy_refresh_interval = build_refresh_interval_expression(
+                    AppCountryStatus.price_volatility,
+                    AppCountryStatus.is_available,
+                    select(App.is_free).where(App.id == AppCountryStatus.app_id).scalar_subquery(),
+                    select(App.total_recommendations).where(App.id == AppCountryStatus.app_id).scalar_subquery()
+                )
+                await session.execute(
+                    update(AppCountryStatus)
+                    .where(AppCountryStatus.app_id == any_(literal(app_ids, ARRAY(Integer))))
+                    .values(
+                        last_updated=now,
+                        last_status=AppUpdateStatus.success,
+                        failure_count=0,
+                        leased_until=None,
+                        next_update_at=literal(now) + func.make_interval(0, 0, 0, 0, 0, 0, legacy_refresh_interval)
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                await session.execute(
                     update(App)
-                    .where(App.id.in_(batch_of_ids))
-                    # we have time gap between datetime.now() and actual updating time on backend
-                    .values(last_updated=datetime.now())
+                    .where(App.id == any_(literal(app_ids, ARRAY(Integer))))
+                    .values(last_updated=now, metadata_updated_at=now)
                 )
 
-                session.execute(query)
-                session.commit()
+            if failed_pairs:
+                # failed pair isn't requested again until retry delay, which grows exponentially with every failure
+                retry_delay = func.least(
+                    settings.FAILED_PAIRS_RETRY_DELAY * func.power(2, AppCountryStatus.failure_count),
+                    settings.FAILED_PAIRS_MAX_RETRY_DELAY
+                )
+                await session.execute(
+                    update(AppCountryStatus)
+                    .where(tuple_(AppCountryStatus.app_id, AppCountryStatus.country_code).in_(failed_pairs))
+                    .values(
+                        last_status=AppUpdateStatus.failure,
+                        failure_count=AppCountryStatus.failure_count + 1,
+                        leased_until=literal(now) + func.make_interval(0, 0, 0, 0, 0, 0, retry_delay)
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+
+            await session.commit()
 
-        self.logger.debug(f'Task "actualize_app_list": updated status of {len(app_ids)} apps')
+        self.logger.debug(
+            f'Task "update_apps_status": updated status of {len(updated_pairs)} pairs and {len(app_ids)} apps,'
+            f' {len(failed_pairs)} pairs failed'
+        )
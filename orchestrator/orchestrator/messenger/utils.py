@@ -1,6 +1,8 @@
 import asyncio
 import functools
 from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
 
 
 THREAD_POOL_EXECUTOR_MAX_WORKERS = 5
@@ -15,6 +17,19 @@ def batch_slicer(collection, batch_size=1000):
         yield collection[i:i + batch_size]
 
 
+def parse_backend_timestamp(timestamp: Optional[str]) -> Optional[datetime]:
+    # backend timestamps are aware, db stores naive local time, as datetime.now() returns
+    if not timestamp:
+        return None
+
+    parsed_timestamp = datetime.fromisoformat(timestamp)
+
+    if parsed_timestamp.tzinfo is None:
+        return parsed_timestamp
+
+    return parsed_timestamp.astimezone().replace(tzinfo=None)
+
+
 # FIXME: Dead code
 def async_execute(coro: callable) -> callable:
     def run_coro(coroutine: callable, *args, **kwargs):
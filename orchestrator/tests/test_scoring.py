@@ -0,0 +1,108 @@
+import math
+from typing import Any
+
+import pytest
+from sqlalchemy import Boolean, Float, Integer, create_engine, event, literal, select
+
+from orchestrator.core.config import settings
+from orchestrator.db.scoring import build_price_volatility_expression, build_refresh_interval_expression
+
+
+@pytest.fixture(scope='module')
+def connection():
+    """
+    Expressions are evaluated by sqlite, functions missing in it are the same as in postgres
+    """
+
+    engine = create_engine('sqlite://')
+
+    @event.listens_for(engine, 'connect')
+    def register_functions(dbapi_connection, _connection_record):
+        dbapi_connection.create_function('ln', 1, math.log)
+        dbapi_connection.create_function('greatest', -1, max)
+        dbapi_connection.create_function('least', -1, min)
+
+    with engine.connect() as connection:
+        yield connection
+
+
+def evaluate_volatility(connection, volatility: float, previous: tuple[Any, Any], actual: tuple[Any, Any]) -> float:
+    expression = build_price_volatility_expression(
+        literal(volatility, Float),
+        literal(previous[0], Float),
+        literal(previous[1], Integer),
+        literal(actual[0], Float),
+        literal(actual[1], Integer)
+    )
+    return connection.execute(select(expression)).scalar_one()
+
+
+def evaluate_interval(
+        connection,
+        volatility: float = 0.0,
+        is_available: bool | None = True,
+        is_free: bool | None = False,
+        total_recommendations: int | None = 0
+) -> float:
+    expression = build_refresh_interval_expression(
+        literal(volatility, Float),
+        literal(is_available, Boolean),
+        literal(is_free, Boolean),
+        literal(total_recommendations, Integer)
+    )
+    return connection.execute(select(expression)).scalar_one()
+
+
+def test_volatility_decays_without_price_change(connection):
+    assert evaluate_volatility(connection, 2.0, (9.99, 10), (9.99, 10)) == pytest.approx(
+        2.0 * settings.PRICE_VOLATILITY_DECAY
+    )
+
+
+@pytest.mark.parametrize('actual', [(4.99, 10), (9.99, 50), (9.99, None)])
+def test_volatility_grows_on_price_or_discount_change(connection, actual: tuple[Any, Any]):
+    assert evaluate_volatility(connection, 2.0, (9.99, 10), actual) == pytest.approx(
+        2.0 * settings.PRICE_VOLATILITY_DECAY + 1.0
+    )
+
+
+@pytest.mark.parametrize('previous, actual', [((None, None), (9.99, 10)), ((9.99, 10), (None, None))])
+def test_volatility_ignores_unknown_prices(connection, previous: tuple[Any, Any], actual: tuple[Any, Any]):
+    assert evaluate_volatility(connection, 1.0, previous, actual) == pytest.approx(settings.PRICE_VOLATILITY_DECAY)
+
+
+def test_interval_of_stable_unpopular_app_is_base_interval(connection):
+    assert evaluate_interval(connection) == pytest.approx(settings.REFRESH_INTERVAL)
+
+
+def test_interval_shrinks_with_volatility_and_popularity(connection):
+    base_interval = evaluate_interval(connection)
+
+    assert evaluate_interval(connection, volatility=1.0) == pytest.approx(base_interval / 2)
+    assert evaluate_interval(connection, total_recommendations=10 ** 4) == pytest.approx(
+        base_interval / (1 + settings.POPULARITY_REFRESH_WEIGHT * math.log(1 + 10 ** 4))
+    )
+
+
+def test_unknown_recommendations_are_counted_as_zero(connection):
+    assert evaluate_interval(connection, total_recommendations=None) == pytest.approx(evaluate_interval(connection))
+
+
+def test_interval_grows_for_free_and_unavailable_apps(connection):
+    base_interval = evaluate_interval(connection, volatility=3.0)
+
+    assert evaluate_interval(connection, volatility=3.0, is_free=True) == pytest.approx(
+        base_interval * settings.FREE_APPS_REFRESH_FACTOR
+    )
+    assert evaluate_interval(connection, volatility=3.0, is_available=False) == pytest.approx(
+        base_interval * settings.UNAVAILABLE_APPS_REFRESH_FACTOR
+    )
+    # unknown flags don't change the interval
+    assert evaluate_interval(connection, volatility=3.0, is_free=None, is_available=None) == pytest.approx(
+        base_interval
+    )
+
+
+def test_interval_is_bounded(connection):
+    assert evaluate_interval(connection, volatility=10 ** 6) == settings.MIN_REFRESH_INTERVAL
+    assert evaluate_interval(connection, is_free=True, is_available=False) == settings.MAX_REFRESH_INTERVAL
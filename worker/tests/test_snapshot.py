@@ -0,0 +1,80 @@
+import time
+
+from worker.celery.snapshot import AppListSnapshot, build_bitmap, iter_difference, iter_marking_bitmap, set_bit
+
+
+class FakeStorage:
+    def __init__(self, values: dict[str, bytes]):
+        self.values = values
+
+    def get(self, key: str) -> bytes | None:
+        return self.values.get(key)
+
+
+def test_set_bit_uses_redis_bit_order():
+    bitmap = bytearray()
+
+    # SETBIT key 0 1 sets the most significant bit of the first byte
+    set_bit(bitmap, 0)
+    set_bit(bitmap, 9)
+
+    assert bitmap == bytearray([0b10000000, 0b01000000])
+
+
+def test_set_bit_extends_bitmap_only_up_to_the_byte_of_app_id():
+    bitmap = bytearray()
+
+    set_bit(bitmap, 23)
+
+    assert len(bitmap) == 3
+    assert bitmap[2] == 0b00000001
+
+
+def test_build_bitmap_ignores_duplicates():
+    assert build_bitmap([5, 5, 3]) == build_bitmap([3, 5])
+
+
+def test_iter_marking_bitmap_yields_app_ids_and_marks_them():
+    bitmap = bytearray()
+
+    assert list(iter_marking_bitmap(iter([10, 1]), bitmap)) == [10, 1]
+    assert bitmap == build_bitmap([1, 10])
+
+
+def test_iter_difference_yields_added_app_ids_in_order():
+    previous = build_bitmap([1, 8, 100])
+    actual = build_bitmap([1, 7, 8, 64, 100, 1000])
+
+    assert list(iter_difference(actual, previous)) == [7, 64, 1000]
+    assert list(iter_difference(previous, actual)) == []
+
+
+def test_iter_difference_of_shorter_bitmap_yields_removed_app_ids():
+    previous = build_bitmap([2, 5000])
+    actual = build_bitmap([2])
+
+    assert list(iter_difference(previous, actual)) == [5000]
+    assert list(iter_difference(actual, previous)) == []
+
+
+def test_iter_difference_with_empty_subtrahend_yields_all_app_ids():
+    app_ids = [0, 7, 8, 255, 256]
+
+    assert list(iter_difference(build_bitmap(app_ids), b'')) == app_ids
+
+
+def test_reconciliation_is_required_without_reconciliation_time():
+    snapshot = AppListSnapshot(FakeStorage({}), key='snapshot', reconciliation_interval=60)
+
+    assert snapshot.is_reconciliation_required()
+
+
+def test_reconciliation_is_required_after_interval():
+    reconciled_at_key = AppListSnapshot.build_reconciled_at_key('snapshot')
+    recent_storage = FakeStorage({reconciled_at_key: str(int(time.time()) - 10).encode()})
+    outdated_storage = FakeStorage({reconciled_at_key: str(int(time.time()) - 120).encode()})
+    recent_snapshot = AppListSnapshot(recent_storage, key='snapshot', reconciliation_interval=60)
+    outdated_snapshot = AppListSnapshot(outdated_storage, key='snapshot', reconciliation_interval=60)
+
+    assert not recent_snapshot.is_reconciliation_required()
+    assert outdated_snapshot.is_reconciliation_required()
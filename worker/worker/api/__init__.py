@@ -1,3 +1,3 @@
 from .steam import SteamAPIClient, AsyncSteamAPIClient
 from .backend import AsyncBackendAPIClient
-from .connections import backend_api_client, steam_api_client
+from .connections import backend_api_client, steam_api_client, steam_rate_limiter
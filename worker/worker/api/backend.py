@@ -21,16 +21,26 @@ class BackendAPIClientException(APIClientException):
 class BackendAPI(abc.ABC):
     class BackendAPIUrl(Enum):
         app_data_package = settings.BACKEND_PACKAGE_ENDPOINT_URL
+        app_data_packages_bulk = settings.BACKEND_PACKAGE_BULK_ENDPOINT_URL
 
     @classmethod
     @property
     def get_app_data_package_endpoint(cls) -> str:
         return cls.BackendAPIUrl.app_data_package.value
 
+    @classmethod
+    @property
+    def get_app_data_packages_bulk_endpoint(cls) -> str:
+        return cls.BackendAPIUrl.app_data_packages_bulk.value
+
     @abc.abstractmethod
     def post_app_data_package(self, app_data_package: dict[str, Any]) -> dict[str, Any]:
         ...
 
+    @abc.abstractmethod
+    def post_app_data_packages(self, app_data_packages: list[dict[str, Any]]) -> dict[str, Any]:
+        ...
+
 
 class AsyncBackendSessionClient(BaseAsyncSessionClient, BackendAPI):
     """
@@ -50,6 +60,19 @@ class AsyncBackendSessionClient(BaseAsyncSessionClient, BackendAPI):
             response.raise_for_status()
             return await response.json()
 
+    @handle_response_exceptions(component=__name__, url=BackendAPI.get_app_data_packages_bulk_endpoint, method="POST")
+    @retry()
+    @authenticate_session
+    async def post_app_data_packages(
+            self,
+            app_data_packages: list[dict[str, Any]],
+            headers: dict[str, Any] | None = None
+    ) -> dict[str, Any]:
+        async with self._session.post(
+                self.get_app_data_packages_bulk_endpoint, json=app_data_packages, headers=headers) as response:
+            response.raise_for_status()
+            return await response.json()
+
 
 class AsyncBackendAPIClient(BaseAsyncAPIClient, BackendAPI):
     SESSION_CLIENT = AsyncBackendSessionClient
@@ -67,3 +90,17 @@ class AsyncBackendAPIClient(BaseAsyncAPIClient, BackendAPI):
             async with session.post(self.get_app_data_package_endpoint, json=app_data_package, headers=headers) as response:
                 response.raise_for_status()
                 return await response.json()
+
+    @handle_response_exceptions(component=__name__, url=BackendAPI.get_app_data_packages_bulk_endpoint, method="POST")
+    @retry()
+    @authenticate
+    async def post_app_data_packages(
+            self,
+            app_data_packages: list[dict[str, Any]],
+            headers: dict[str, Any] | None = None
+    ) -> dict[str, Any]:
+        async with self.CLIENT_FOR_SINGLE_REQUESTS() as session:
+            async with session.post(
+                    self.get_app_data_packages_bulk_endpoint, json=app_data_packages, headers=headers) as response:
+                response.raise_for_status()
+                return await response.json()
@@ -158,6 +158,57 @@ def retry(timeout: int = 5, attempts: int = 2, request_exceptions: tuple[Excepti
     return decorator
 
 
+THROTTLING_STATUSES = (429, 503)
+
+
+def _parse_retry_after(headers: Any) -> float | None:
+    try:
+        return float(headers.get('Retry-After'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def rate_limited(decorated: callable) -> callable:
+    """
+    Takes a token from rate limiter of the client (self.rate_limiter) before each request
+    and suspends requests of all clients sharing the limiter if API responded with throttling status
+    """
+
+    @functools.wraps(decorated)
+    async def async_wrapper(self, *args, **kwargs) -> Any:
+        if (rate_limiter := self.rate_limiter) is None:
+            return await decorated(self, *args, **kwargs)
+
+        await rate_limiter.async_acquire()
+
+        try:
+            return await decorated(self, *args, **kwargs)
+
+        except ClientResponseError as response_error:
+            if response_error.status in THROTTLING_STATUSES:
+                await rate_limiter.async_penalize(retry_after=_parse_retry_after(response_error.headers))
+
+            raise response_error
+
+    @functools.wraps(decorated)
+    def sync_wrapper(self, *args, **kwargs) -> Any:
+        if (rate_limiter := self.rate_limiter) is None:
+            return decorated(self, *args, **kwargs)
+
+        rate_limiter.acquire()
+
+        try:
+            return decorated(self, *args, **kwargs)
+
+        except requests.exceptions.HTTPError as response_error:
+            if response_error.response is not None and response_error.response.status_code in THROTTLING_STATUSES:
+                rate_limiter.penalize(retry_after=_parse_retry_after(response_error.response.headers))
+
+            raise response_error
+
+    return async_wrapper if asyncio.iscoroutinefunction(decorated) else sync_wrapper
+
+
 class AbstractAsyncSessionClient(abc.ABC):
     SESSION_CLASS = ...
 
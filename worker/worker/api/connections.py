@@ -2,10 +2,20 @@ from worker.core.config import settings
 
 from .backend import AsyncBackendAPIClient
 from .steam import SteamAPIClient
+from .rate_limit import DistributedTokenBucket
 
 
 backend_api_client = AsyncBackendAPIClient(
     client_id=settings.ESSENTIAL_WORKER_CLIENT_ID,
     client_secret=settings.ESSENTIAL_WORKER_CLIENT_SECRET
 )
-steam_api_client = SteamAPIClient()
+steam_rate_limiter = DistributedTokenBucket(
+    redis_url=settings.STEAM_API_RATE_LIMIT_STORAGE_URL,
+    key=settings.STEAM_API_RATE_LIMIT_KEY,
+    rate_per_minute=settings.STEAM_API_RATE_LIMIT_PER_MINUTE,
+    capacity=settings.STEAM_API_RATE_LIMIT_BURST,
+    backoff_base=settings.STEAM_API_RATE_LIMIT_BACKOFF_BASE,
+    backoff_max=settings.STEAM_API_RATE_LIMIT_BACKOFF_MAX,
+    max_wait=settings.STEAM_API_RATE_LIMIT_MAX_WAIT,
+)
+steam_api_client = SteamAPIClient(rate_limiter=steam_rate_limiter)
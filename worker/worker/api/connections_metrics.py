@@ -0,0 +1,15 @@
+class ConnectionsMetrics:
+    def __init__(self, created: int = 0, reused: int = 0):
+        self.created = created
+        self.reused = reused
+
+    @property
+    def reuse_ratio(self) -> float:
+        total = self.created + self.reused
+        return self.reused / total if total else 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f'<ConnectionsMetrics: created={self.created}, reused={self.reused},'
+            f' reuse ratio={self.reuse_ratio:.2f}>'
+        )
@@ -0,0 +1,148 @@
+import asyncio
+import math
+import time
+
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+
+from worker.core.config import settings
+from worker.core.logger import get_logger
+from .base import APIClientException
+
+
+logger = get_logger(settings, 'external_api.rate_limit')
+
+
+class RateLimitExceeded(APIClientException):
+    pass
+
+
+# KEYS: bucket, blocked_until
+# ARGV: capacity, refill rate (tokens per ms), bucket ttl (ms)
+# Returns 0 if token is taken, otherwise the amount of ms after which it makes sense to try again.
+# Redis server time is used, so the clock is the same for all worker replicas.
+ACQUIRE_TOKEN_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill_rate = tonumber(ARGV[2])
+local bucket_ttl = tonumber(ARGV[3])
+
+local server_time = redis.call('TIME')
+local now = tonumber(server_time[1]) * 1000 + math.floor(tonumber(server_time[2]) / 1000)
+
+local blocked_until = tonumber(redis.call('GET', KEYS[2]) or '0')
+if blocked_until > now then
+    return blocked_until - now
+end
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'timestamp')
+local tokens = tonumber(bucket[1]) or capacity
+local timestamp = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - timestamp) * refill_rate)
+
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) / refill_rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'timestamp', now)
+redis.call('PEXPIRE', KEYS[1], bucket_ttl)
+return wait
+"""
+
+# KEYS: blocked_until, backoff
+# ARGV: base backoff (ms), max backoff (ms), backoff requested by API (ms, 0 if absent)
+# Doubles the backoff on every throttling response. The backoff key expires after twice its value,
+# so the next throttling after a calm period starts again from the base backoff.
+PENALIZE_SCRIPT = """
+local base_backoff = tonumber(ARGV[1])
+local max_backoff = tonumber(ARGV[2])
+local requested_backoff = tonumber(ARGV[3])
+
+local server_time = redis.call('TIME')
+local now = tonumber(server_time[1]) * 1000 + math.floor(tonumber(server_time[2]) / 1000)
+
+local backoff = tonumber(redis.call('GET', KEYS[2]) or '0')
+backoff = math.min(max_backoff, math.max(base_backoff, requested_backoff, backoff * 2))
+
+redis.call('SET', KEYS[1], now + backoff, 'PX', backoff)
+redis.call('SET', KEYS[2], backoff, 'PX', backoff * 2)
+return backoff
+"""
+
+
+class DistributedTokenBucket:
+    """
+    Token bucket shared by all processes connected to the same redis.
+    Sync methods are used by celery tasks, async ones - by async api clients.
+    """
+
+    def __init__(
+            self,
+            redis_url: str,
+            key: str,
+            rate_per_minute: int,
+            capacity: int = 1,
+            backoff_base: int = 10,
+            backoff_max: int = 300,
+            max_wait: int | None = None,
+    ):
+        self._bucket_key = f'{key}:bucket'
+        self._blocked_until_key = f'{key}:blocked_until'
+        self._backoff_key = f'{key}:backoff'
+
+        self._capacity = capacity
+        self._refill_rate = rate_per_minute / 60 / 1000
+        self._bucket_ttl = math.ceil(capacity / self._refill_rate) + 1000
+        self._backoff_base = backoff_base * 1000
+        self._backoff_max = backoff_max * 1000
+        self._max_wait = max_wait
+
+        self._redis = Redis.from_url(redis_url)
+        self._async_redis = AsyncRedis.from_url(redis_url)
+        self._acquire_token = self._redis.register_script(ACQUIRE_TOKEN_SCRIPT)
+        self._async_acquire_token = self._async_redis.register_script(ACQUIRE_TOKEN_SCRIPT)
+        self._penalize = self._redis.register_script(PENALIZE_SCRIPT)
+        self._async_penalize = self._async_redis.register_script(PENALIZE_SCRIPT)
+
+    @property
+    def _acquire_args(self) -> tuple[list[str], list[int | float]]:
+        return [self._bucket_key, self._blocked_until_key], [self._capacity, self._refill_rate, self._bucket_ttl]
+
+    def _penalize_args(self, retry_after: float | None) -> tuple[list[str], list[int]]:
+        requested_backoff = int(retry_after * 1000) if retry_after else 0
+        return [self._blocked_until_key, self._backoff_key], [self._backoff_base, self._backoff_max, requested_backoff]
+
+    def _raise_if_waiting_too_long(self, waiting_started_at: float, wait: float):
+        if self._max_wait is None:
+            return
+
+        if time.monotonic() - waiting_started_at + wait > self._max_wait:
+            raise RateLimitExceeded(f'Token was not acquired in {self._max_wait} seconds')
+
+    def acquire(self):
+        waiting_started_at = time.monotonic()
+        keys, args = self._acquire_args
+
+        while wait := self._acquire_token(keys=keys, args=args) / 1000:
+            self._raise_if_waiting_too_long(waiting_started_at, wait)
+            time.sleep(wait)
+
+    async def async_acquire(self):
+        waiting_started_at = time.monotonic()
+        keys, args = self._acquire_args
+
+        while wait := await self._async_acquire_token(keys=keys, args=args) / 1000:
+            self._raise_if_waiting_too_long(waiting_started_at, wait)
+            await asyncio.sleep(wait)
+
+    def penalize(self, retry_after: float | None = None):
+        keys, args = self._penalize_args(retry_after)
+        backoff = self._penalize(keys=keys, args=args)
+        logger.warning(f'Requests are throttled by API. All requests are suspended for {backoff / 1000} seconds')
+
+    async def async_penalize(self, retry_after: float | None = None):
+        keys, args = self._penalize_args(retry_after)
+        backoff = await self._async_penalize(keys=keys, args=args)
+        logger.warning(f'Requests are throttled by API. All requests are suspended for {backoff / 1000} seconds')
@@ -1,10 +1,13 @@
 import abc
+import os
+from types import SimpleNamespace
 from typing import Any
 
 import aiohttp
 from enum import Enum
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from worker.core.config import settings
 from .base import (
@@ -12,7 +15,10 @@ from .base import (
     BaseAsyncAPIClient,
     BaseAsyncSessionClient,
     handle_response_exceptions,
+    rate_limited,
 )
+from .rate_limit import DistributedTokenBucket
+from .connections_metrics import ConnectionsMetrics
 
 
 class SteamAPIClientException(APIClientException):
@@ -42,36 +48,143 @@ class SteamAPI(abc.ABC):
     def get_app_detail(self, *args, **kwargs) -> dict[str, Any]:
         ...
 
+    @abc.abstractmethod
+    def get_apps_prices(self, *args, **kwargs) -> dict[str, Any]:
+        """
+        Steam accepts multiple comma-separated appids only with "price_overview" filter,
+        so only prices are available in response
+        """
+        ...
+
+    @staticmethod
+    def _build_apps_prices_params(app_ids: list[int], country_code: str) -> dict[str, Any]:
+        return {
+            'appids': ','.join(str(app_id) for app_id in app_ids),
+            'cc': country_code,
+            'filters': 'price_overview',
+        }
+
 
 class SteamAPIClient(SteamAPI):
+    def __init__(
+            self,
+            rate_limiter: DistributedTokenBucket | None = None,
+            pool_size: int = settings.STEAM_HTTP_POOL_SIZE
+    ):
+        self.rate_limiter = rate_limiter
+        self._pool_size = pool_size
+        self._session: requests.Session | None = None
+        self._session_owner_pid: int | None = None
+
+    @property
+    def session(self) -> requests.Session:
+        # Celery prefork pool forks processes after the client is created,
+        # so each process must have its own connections pool
+        if self._session is None or self._session_owner_pid != os.getpid():
+            self._session = self._create_session()
+            self._session_owner_pid = os.getpid()
+
+        return self._session
+
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self._pool_size, pool_maxsize=self._pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    @property
+    def connections_metrics(self) -> ConnectionsMetrics:
+        metrics = ConnectionsMetrics()
+
+        if self._session is None:
+            return metrics
+
+        for adapter in self._session.adapters.values():
+            pools = adapter.poolmanager.pools
+
+            for pool_key in pools.keys():
+                if (pool := pools.get(pool_key)) is None:
+                    continue
+
+                metrics.created += pool.num_connections
+                metrics.reused += max(0, pool.num_requests - pool.num_connections)
+
+        return metrics
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
     @handle_response_exceptions(component=__name__, url=SteamAPI.get_app_list_url, method="GET")
+    @rate_limited
     def get_app_list(self) -> dict[str, Any]:
-        response = requests.get(self.get_app_list_url, params=None)
+        response = self.session.get(self.get_app_list_url, params=None)
         response.raise_for_status()
         return response.json()
 
+    @handle_response_exceptions(component=__name__, url=SteamAPI.get_app_list_url, method="GET")
+    @rate_limited
+    def get_app_list_stream(self) -> requests.Response:
+        """
+        Response body isn't loaded, it must be read from response.raw and the response must be closed
+        """
+
+        response = self.session.get(self.get_app_list_url, params=None, stream=True)
+        response.raise_for_status()
+        response.raw.decode_content = True
+        return response
+
     @handle_response_exceptions(component=__name__, url=SteamAPI.get_app_detail_url, method="GET")
+    @rate_limited
     def get_app_detail(self, app_id, country_code=settings.DEFAULT_COUNTRY_CODE) -> dict[str, Any]:
         params = {
             'appids': app_id,
             'cc': country_code,
         }
 
-        response = requests.get(self.get_app_detail_url, params=params)
+        response = self.session.get(self.get_app_detail_url, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    @handle_response_exceptions(component=__name__, url=SteamAPI.get_app_detail_url, method="GET")
+    @rate_limited
+    def get_apps_prices(self, app_ids: list[int], country_code=settings.DEFAULT_COUNTRY_CODE) -> dict[str, Any]:
+        params = self._build_apps_prices_params(app_ids, country_code)
+
+        response = self.session.get(self.get_app_detail_url, params=params)
         response.raise_for_status()
         return response.json()
 
 
 class AsyncSteamSessionClient(BaseAsyncSessionClient, SteamAPI):
+    """
+    Uses pooled session of the API client, so it isn't closed together with the session client
+    """
+
     SESSION_CLASS = aiohttp.ClientSession
 
+    def __init__(self, client: 'AsyncSteamAPIClient', *args, **kwargs):
+        self._client = client
+        self._session = client.pooled_session
+
+    async def close(self):
+        ...
+
+    @property
+    def rate_limiter(self) -> DistributedTokenBucket | None:
+        return self._client.rate_limiter
+
     @handle_response_exceptions(component=__name__, url=SteamAPI.get_app_list_url, method="GET")
+    @rate_limited
     async def get_app_list(self) -> dict[str, Any]:
         async with self._session.get(self.get_app_list_url, params=None) as response:
             response.raise_for_status()
             return await response.json()
 
     @handle_response_exceptions(component=__name__, url=SteamAPI.get_app_detail_url, method="GET")
+    @rate_limited
     async def get_app_detail(self, app_id: int, country_code: str = settings.DEFAULT_COUNTRY_CODE) -> dict[str, Any]:
         params = {
             'appids': app_id,
@@ -82,27 +195,98 @@ class AsyncSteamSessionClient(BaseAsyncSessionClient, SteamAPI):
             response.raise_for_status()
             return await response.json()
 
+    @handle_response_exceptions(component=__name__, url=SteamAPI.get_app_detail_url, method="GET")
+    @rate_limited
+    async def get_apps_prices(
+            self, app_ids: list[int], country_code: str = settings.DEFAULT_COUNTRY_CODE) -> dict[str, Any]:
+        params = self._build_apps_prices_params(app_ids, country_code)
+
+        async with self._session.get(self.get_app_detail_url, params=params) as response:
+            response.raise_for_status()
+            return await response.json()
+
 
 class AsyncSteamAPIClient(BaseAsyncAPIClient, SteamAPI):
     SESSION_CLIENT = AsyncSteamSessionClient
-    SESSION_CLIENT_FOR_SINGLE_REQUESTS = aiohttp.ClientSession
     API_CLIENT_EXCEPTION_CLASS = SteamAPIClientException
 
+    def __init__(
+            self,
+            *args,
+            rate_limiter: DistributedTokenBucket | None = None,
+            pool_size: int = settings.STEAM_HTTP_POOL_SIZE,
+            keepalive_timeout: int = settings.STEAM_HTTP_KEEPALIVE_TIMEOUT,
+            dns_cache_ttl: int = settings.STEAM_HTTP_DNS_CACHE_TTL,
+            **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        self.rate_limiter = rate_limiter
+        self._pool_size = pool_size
+        self._keepalive_timeout = keepalive_timeout
+        self._dns_cache_ttl = dns_cache_ttl
+        self._pooled_session: aiohttp.ClientSession | None = None
+        self.connections_metrics = ConnectionsMetrics()
+
+    @property
+    def pooled_session(self) -> aiohttp.ClientSession:
+        """
+        Long-lived session, must be requested inside the event loop it will be used in
+        """
+
+        if self._pooled_session is None or self._pooled_session.closed:
+            self._pooled_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self._pool_size,
+                    keepalive_timeout=self._keepalive_timeout,
+                    ttl_dns_cache=self._dns_cache_ttl,
+                ),
+                trace_configs=[self._create_connections_trace_config()],
+            )
+
+        return self._pooled_session
+
+    def _create_connections_trace_config(self) -> aiohttp.TraceConfig:
+        async def on_connection_create_end(*args, **kwargs):
+            self.connections_metrics.created += 1
+
+        async def on_connection_reuseconn(*args, **kwargs):
+            self.connections_metrics.reused += 1
+
+        trace_config = aiohttp.TraceConfig(trace_config_ctx_factory=SimpleNamespace)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+
+    async def close(self):
+        if self._pooled_session is not None:
+            await self._pooled_session.close()
+            self._pooled_session = None
+
     @handle_response_exceptions(component=__name__, url=SteamAPI.get_app_list_url, method="GET")
+    @rate_limited
     async def get_app_list(self) -> dict[str, Any]:
-        async with self.SESSION_CLIENT_FOR_SINGLE_REQUESTS() as session:
-            async with session.get(self.get_app_list_url) as response:
-                response.raise_for_status()
-                return await response.json()
+        async with self.pooled_session.get(self.get_app_list_url) as response:
+            response.raise_for_status()
+            return await response.json()
 
     @handle_response_exceptions(component=__name__, url=SteamAPI.get_app_detail_url, method="GET")
+    @rate_limited
     async def get_app_detail(self, app_id: int, country_code: str =settings.DEFAULT_COUNTRY_CODE) -> dict[str, Any]:
         params = {
             'appids': app_id,
             'cc': country_code,
         }
 
-        async with self.SESSION_CLIENT_FOR_SINGLE_REQUESTS() as session:
-            async with session.get(self.get_app_detail_url, params=params) as response:
-                response.raise_for_status()
-                return await response.json()
+        async with self.pooled_session.get(self.get_app_detail_url, params=params) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    @handle_response_exceptions(component=__name__, url=SteamAPI.get_app_detail_url, method="GET")
+    @rate_limited
+    async def get_apps_prices(
+            self, app_ids: list[int], country_code: str = settings.DEFAULT_COUNTRY_CODE) -> dict[str, Any]:
+        params = self._build_apps_prices_params(app_ids, country_code)
+
+        async with self.pooled_session.get(self.get_app_detail_url, params=params) as response:
+            response.raise_for_status()
+            return await response.json()
@@ -1,3 +1,13 @@
 from worker.celery.app import celery_app
-from worker.celery.utils import execute_celery_task
-from worker.celery.tasks import get_app_list_celery_task, get_app_detail_celery_task
+from worker.celery.utils import (
+    execute_celery_task,
+    read_app_list_chunks,
+    delete_app_list_chunks,
+    promote_app_list_snapshot,
+)
+from worker.celery.tasks import (
+    get_app_list_celery_task,
+    stream_app_list_celery_task,
+    get_app_detail_celery_task,
+    get_apps_prices_celery_task,
+)
@@ -0,0 +1,14 @@
+from redis import Redis as SyncRedis
+from redis.asyncio import Redis
+
+from worker.core.config import settings
+
+
+# Celery's redis result backend publishes every stored task state to a channel named after the result key,
+# so the same instance is used to await task completion instead of polling the backend.
+celery_result_notifier = Redis.from_url(settings.CELERY_BACKEND)
+
+# Streamed steam app list is stored in chunks apart from the task result,
+# so the messenger can consume it chunk by chunk instead of loading the whole list.
+app_list_chunks_storage = SyncRedis.from_url(settings.CELERY_BACKEND)
+app_list_chunks_async_storage = Redis.from_url(settings.CELERY_BACKEND)
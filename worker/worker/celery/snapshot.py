@@ -0,0 +1,104 @@
+import time
+from typing import Iterable, Iterator
+from uuid import uuid4
+
+from redis import Redis
+
+from worker.core.config import settings
+
+
+class AppListSnapshot:
+    """
+    Known app ids stored in redis as a bitmap, where the number of a set bit is an app id.
+    Bit order is the same as in redis SETBIT/GETBIT, so the snapshot can be inspected with redis commands.
+    """
+
+    def __init__(
+            self,
+            storage: Redis,
+            key: str = settings.STEAM_APP_LIST_SNAPSHOT_KEY,
+            reconciliation_interval: int = settings.STEAM_APP_LIST_RECONCILIATION_INTERVAL,
+    ):
+        self._storage = storage
+        self._bitmap_key = key
+        self._reconciled_at_key = self.build_reconciled_at_key(key)
+        self._reconciliation_interval = reconciliation_interval
+
+    @staticmethod
+    def build_reconciled_at_key(key: str) -> str:
+        return f'{key}:reconciled_at'
+
+    def load(self) -> bytes | None:
+        return self._storage.get(self._bitmap_key)
+
+    def stage(self, bitmap: bytearray, is_reconciled: bool = False) -> str:
+        """
+        New bitmap is stored apart from the current snapshot, it replaces the snapshot only after
+        the changes found by it are delivered (see promote_app_list_snapshot). Returns the key of the staged bitmap.
+        """
+
+        staged_key = f'{self._bitmap_key}:staged:{uuid4()}'
+
+        with self._storage.pipeline() as pipeline:
+            pipeline.set(staged_key, bytes(bitmap), ex=settings.STEAM_APP_LIST_CHUNKS_TTL)
+
+            if is_reconciled:
+                pipeline.set(
+                    self.build_reconciled_at_key(staged_key), int(time.time()), ex=settings.STEAM_APP_LIST_CHUNKS_TTL
+                )
+
+            pipeline.execute()
+
+        return staged_key
+
+    def is_reconciliation_required(self) -> bool:
+        if (reconciled_at := self._storage.get(self._reconciled_at_key)) is None:
+            return True
+
+        return time.time() - int(reconciled_at) > self._reconciliation_interval
+
+
+def set_bit(bitmap: bytearray, app_id: int):
+    byte_index = app_id >> 3
+
+    if byte_index >= len(bitmap):
+        bitmap.extend(bytes(byte_index - len(bitmap) + 1))
+
+    bitmap[byte_index] |= 0x80 >> (app_id & 7)
+
+
+def iter_marking_bitmap(app_ids: Iterable[int], bitmap: bytearray) -> Iterator[int]:
+    """
+    Sets bits of app ids in the bitmap while they are consumed
+    """
+
+    for app_id in app_ids:
+        set_bit(bitmap, app_id)
+        yield app_id
+
+
+def build_bitmap(app_ids: Iterable[int]) -> bytearray:
+    bitmap = bytearray()
+
+    for app_id in app_ids:
+        set_bit(bitmap, app_id)
+
+    return bitmap
+
+
+def iter_difference(minuend: bytes, subtrahend: bytes) -> Iterator[int]:
+    """
+    Yields app ids which are set in the first bitmap, but not in the second one
+    """
+
+    subtrahend_length = len(subtrahend)
+
+    for byte_index, byte in enumerate(minuend):
+        other_byte = subtrahend[byte_index] if byte_index < subtrahend_length else 0
+
+        if not (difference := byte & ~other_byte):
+            continue
+
+        for bit in range(8):
+            if difference & (0x80 >> bit):
+                yield (byte_index << 3) + bit
@@ -1,6 +1,18 @@
+from uuid import uuid4
+
+import ijson
+from celery.signals import task_postrun, worker_process_shutdown
+
 from worker.celery.app import celery_app
 from worker.core.config import settings
+from worker.core.logger import get_logger
 from worker.api import steam_api_client
+from worker.celery.connections import app_list_chunks_storage
+from worker.celery.snapshot import AppListSnapshot, build_bitmap, iter_difference, iter_marking_bitmap
+from worker.celery.utils import push_app_list_chunks
+
+
+logger = get_logger(settings)
 
 
 @celery_app.task(
@@ -12,6 +24,72 @@ def get_app_list_celery_task(*args, **kwargs):
     return steam_api_client.get_app_list()
 
 
+@celery_app.task(
+    name="stream_app_list",
+    rate_limit=settings.CELERY_TASK_COMMON_RATE_LIMIT,
+    time_limit=settings.CELERY_TASK_TIME_LIMIT,
+)
+def stream_app_list_celery_task(*args, full_reconciliation: bool = False, **kwargs):
+    """
+    Parses app list response incrementally and compares it with the snapshot of the previous app list.
+    Only added and removed app ids are stored in chunks, unless full reconciliation is required -
+    then all app ids are stored. Only the keys of stored chunks and of the staged snapshot are returned as task result.
+    Empty app list is neither stored nor staged, its result has no snapshot key.
+    """
+
+    snapshot = AppListSnapshot(app_list_chunks_storage)
+    previous_bitmap = snapshot.load()
+    is_full = full_reconciliation or previous_bitmap is None or snapshot.is_reconciliation_required()
+
+    chunks_key = f'{settings.STEAM_APP_LIST_CHUNKS_KEY_PREFIX}:{uuid4()}'
+    removed_chunks_key = f'{chunks_key}:removed'
+    chunks_count = 0
+    removed_chunks_count = 0
+
+    with steam_api_client.get_app_list_stream() as response:
+        app_ids = ijson.items(response.raw, 'applist.apps.item.appid')
+
+        if is_full:
+            actual_bitmap = bytearray()
+            chunks_count = push_app_list_chunks(chunks_key, iter_marking_bitmap(app_ids, actual_bitmap))
+
+        else:
+            actual_bitmap = build_bitmap(app_ids)
+
+    if not any(actual_bitmap):
+        # removal of all known apps is more likely to be a steam failure than a real change,
+        # repeating the task won't fix the response, so nothing is staged and the snapshot stays as is
+        logger.warning('Steam returned empty app list, app list is left unchanged')
+        return {
+            'chunks_key': chunks_key,
+            'chunks_count': 0,
+            'removed_chunks_key': removed_chunks_key,
+            'removed_chunks_count': 0,
+            'is_full': is_full,
+            'staged_snapshot_key': None,
+        }
+
+    if not is_full:
+        chunks_count = push_app_list_chunks(chunks_key, iter_difference(actual_bitmap, previous_bitmap))
+
+    if previous_bitmap is not None:
+        removed_chunks_count = push_app_list_chunks(
+            removed_chunks_key, iter_difference(previous_bitmap, actual_bitmap)
+        )
+
+    # snapshot moves forward only after the messenger has published the chunks
+    staged_snapshot_key = snapshot.stage(actual_bitmap, is_reconciled=is_full)
+
+    return {
+        'chunks_key': chunks_key,
+        'chunks_count': chunks_count,
+        'removed_chunks_key': removed_chunks_key,
+        'removed_chunks_count': removed_chunks_count,
+        'is_full': is_full,
+        'staged_snapshot_key': staged_snapshot_key,
+    }
+
+
 @celery_app.task(
     name="get_app_detail",
     rate_limit=settings.CELERY_TASK_COMMON_RATE_LIMIT,
@@ -19,3 +97,22 @@ def get_app_list_celery_task(*args, **kwargs):
 )
 def get_app_detail_celery_task(*args, **kwargs):
     return steam_api_client.get_app_detail(*args, **kwargs)
+
+
+@celery_app.task(
+    name="get_apps_prices",
+    rate_limit=settings.CELERY_TASK_COMMON_RATE_LIMIT,
+    time_limit=settings.CELERY_TASK_TIME_LIMIT,
+)
+def get_apps_prices_celery_task(*args, **kwargs):
+    return steam_api_client.get_apps_prices(*args, **kwargs)
+
+
+@task_postrun.connect
+def log_steam_connections_metrics(*args, **kwargs):
+    logger.debug(f'Steam API connections: {steam_api_client.connections_metrics}')
+
+
+@worker_process_shutdown.connect
+def close_steam_api_client(*args, **kwargs):
+    steam_api_client.close()
@@ -1,24 +1,37 @@
 import asyncio
-from typing import Any
+import json
+from itertools import islice
+from typing import Any, AsyncIterator, Iterable, Iterator
 
-from celery import Task
+from celery import Task, states
 from celery.exceptions import SoftTimeLimitExceeded
 from celery.result import AsyncResult
 
 from worker.core.config import settings
 from worker.core.logger import get_logger
-
+from worker.celery.app import celery_app
+from worker.celery.snapshot import AppListSnapshot
+from worker.celery.connections import (
+    celery_result_notifier,
+    app_list_chunks_storage,
+    app_list_chunks_async_storage,
+)
 
 
 logger = get_logger(settings)
 
 
-async def execute_celery_task(celery_task: Task, *task_args, **task_kwargs) -> tuple[Any, bool]:
+async def execute_celery_task(
+        celery_task: Task,
+        *task_args,
+        result_timeout: int | None = settings.CELERY_TASK_RESULT_TIMEOUT,
+        **task_kwargs
+) -> tuple[Any, bool]:
     launched_celery_task = None
 
     try:
         launched_celery_task = celery_task.delay(*task_args, **task_kwargs)
-        result = await wait_celery_task_result(launched_celery_task)
+        result = await wait_celery_task_result(launched_celery_task, timeout=result_timeout)
         return result, True
 
     except SoftTimeLimitExceeded:
@@ -27,6 +40,13 @@ async def execute_celery_task(celery_task: Task, *task_args, **task_kwargs) -> t
         )
         return None, False
 
+    except TimeoutError:
+        logger.error(
+            f"Result of task {launched_celery_task if launched_celery_task else celery_task}"
+            f" wasn't received in {result_timeout} seconds."
+        )
+        return None, False
+
     except Exception as error:
         logger.error(
             f"An unexpected error was encountered while attempting to execute task."
@@ -36,11 +56,99 @@ async def execute_celery_task(celery_task: Task, *task_args, **task_kwargs) -> t
         return None, False
 
 
-async def wait_celery_task_result(celery_task: AsyncResult) -> Any:
-    # Primitive hack for non-blocking waiting for task results in an asynchronous context
-    # TODO: add timeout? (But await hasn't)
+def _extract_result_from_task_meta(task_meta: dict[str, Any]) -> Any:
+    if task_meta.get('status') == states.SUCCESS:
+        return task_meta.get('result')
+
+    raise celery_app.backend.exception_to_python(task_meta.get('result'))
+
+
+async def wait_celery_task_result(celery_task: AsyncResult, timeout: int | None = None) -> Any:
+    """
+    Awaits a message from the result backend channel of the task instead of polling its state.
+    Subscription happens before the first state check, so a result stored in between can't be missed.
+    """
+
+    result_key = celery_app.backend.get_key_for_task(celery_task.id)
+
+    async with asyncio.timeout(timeout):
+        async with celery_result_notifier.pubsub() as pubsub:
+            await pubsub.subscribe(result_key)
+
+            if stored_task_meta := await celery_result_notifier.get(result_key):
+                task_meta = celery_app.backend.decode_result(stored_task_meta)
+
+                if task_meta.get('status') in states.READY_STATES:
+                    return _extract_result_from_task_meta(task_meta)
+
+            async for message in pubsub.listen():
+                if message.get('type') != 'message':
+                    continue
+
+                task_meta = celery_app.backend.decode_result(message.get('data'))
+
+                if task_meta.get('status') in states.READY_STATES:
+                    return _extract_result_from_task_meta(task_meta)
+
+
+def iter_chunks(iterable: Iterable, chunk_size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
+
+
+def push_app_list_chunk(chunks_key: str, app_ids: list[int]):
+    with app_list_chunks_storage.pipeline() as pipeline:
+        pipeline.rpush(chunks_key, json.dumps(app_ids))
+        pipeline.expire(chunks_key, settings.STEAM_APP_LIST_CHUNKS_TTL)
+        pipeline.execute()
+
+
+def push_app_list_chunks(chunks_key: str, app_ids: Iterable[int]) -> int:
+    chunks_count = 0
+
+    for chunk in iter_chunks(app_ids, settings.STEAM_APP_LIST_CHUNK_SIZE):
+        push_app_list_chunk(chunks_key, chunk)
+        chunks_count += 1
+
+    return chunks_count
+
+
+async def read_app_list_chunks(chunks_key: str, page_size: int = 10) -> AsyncIterator[list[int]]:
+    """
+    Chunks are only read, they are deleted by delete_app_list_chunks after they are delivered
+    """
+
+    start = 0
+
+    while chunks := await app_list_chunks_async_storage.lrange(chunks_key, start, start + page_size - 1):
+        for chunk in chunks:
+            yield json.loads(chunk)
+
+        start += len(chunks)
+
+
+async def delete_app_list_chunks(*chunks_keys: str):
+    await app_list_chunks_async_storage.delete(*chunks_keys)
+
+
+async def promote_app_list_snapshot(staged_snapshot_key: str):
+    """
+    Replaces the app list snapshot with the staged one. Staged snapshot expires together with the chunks,
+    so if chunks weren't delivered in time, the changes are found again by the next comparison.
+    """
+
+    snapshot_key = settings.STEAM_APP_LIST_SNAPSHOT_KEY
+    staged_reconciled_at_key = AppListSnapshot.build_reconciled_at_key(staged_snapshot_key)
+    reconciled_at = await app_list_chunks_async_storage.get(staged_reconciled_at_key)
+
+    async with app_list_chunks_async_storage.pipeline(transaction=True) as pipeline:
+        pipeline.rename(staged_snapshot_key, snapshot_key)
+        pipeline.persist(snapshot_key)
 
-    while not celery_task.ready():
-        await asyncio.sleep(0.1)
+        if reconciled_at is not None:
+            pipeline.set(AppListSnapshot.build_reconciled_at_key(snapshot_key), reconciled_at)
+            pipeline.delete(staged_reconciled_at_key)
 
-    return celery_task.result
+        await pipeline.execute()
@@ -67,8 +67,42 @@ class WorkerSettings(BaseSettings):
             path=f'api/{settings.BACKEND_API_VERSION}/package',
         ).unicode_string()
 
+    @computed_field
+    @property
+    def BACKEND_PACKAGE_BULK_ENDPOINT_URL(self) -> str:  # type: ignore
+        return AnyUrl.build(
+            scheme=self.BACKEND_PROTOCOL,
+            host=self.BACKEND_HOST,
+            port=self.BACKEND_PORT,
+            path=f'api/{settings.BACKEND_API_VERSION}/package/bulk',
+        ).unicode_string()
+
+    BACKEND_PACKAGES_BULK_SIZE: int = 200
+
     STEAM_APP_LIST_URL: str = 'http://api.steampowered.com/ISteamApps/GetAppList/v2'
     STEAM_APP_DETAIL_URL: str = 'http://store.steampowered.com/api/appdetails'
+    STEAM_REQUESTS_CONCURRENCY: int = 8
+    STEAM_APPS_PRICES_BATCH_SIZE: int = 100
+    STEAM_APP_LIST_CHUNK_SIZE: int = 5000
+    STEAM_APP_LIST_CHUNKS_KEY_PREFIX: str = 'steam_app_list_chunks'
+    STEAM_APP_LIST_CHUNKS_TTL: int = 600
+    STEAM_APP_LIST_SNAPSHOT_KEY: str = 'steam_app_list_snapshot'
+    STEAM_APP_LIST_RECONCILIATION_INTERVAL: int = 86400
+    STEAM_HTTP_POOL_SIZE: int = 10
+    STEAM_HTTP_KEEPALIVE_TIMEOUT: int = 30
+    STEAM_HTTP_DNS_CACHE_TTL: int = 300
+    # Common for all worker replicas
+    STEAM_API_RATE_LIMIT: str = '39/m'
+    STEAM_API_RATE_LIMIT_BURST: int = 1
+    STEAM_API_RATE_LIMIT_KEY: str = 'steam_api_rate_limit'
+    STEAM_API_RATE_LIMIT_BACKOFF_BASE: int = 10
+    STEAM_API_RATE_LIMIT_BACKOFF_MAX: int = 300
+    STEAM_API_RATE_LIMIT_MAX_WAIT: int = 30
+
+    @computed_field
+    @property
+    def STEAM_API_RATE_LIMIT_PER_MINUTE(self) -> int:  # type: ignore
+        return int(self.STEAM_API_RATE_LIMIT[:-2])
 
     LOGGER_WRITE_IN_FILE: bool = False
     LOGGER_LOG_FILES_PATH: str = '../logs'
@@ -79,6 +113,7 @@ class WorkerSettings(BaseSettings):
     CELERY_BROKER_PROTOCOL: str = "redis"
     CELERY_TASK_COMMON_RATE_LIMIT: str = '39/m'
     CELERY_TASK_TIME_LIMIT: int = 40
+    CELERY_TASK_RESULT_TIMEOUT: int = 60
 
     @computed_field
     @property
@@ -106,6 +141,11 @@ class WorkerSettings(BaseSettings):
     def CELERY_BACKEND(self) -> str:  # type: ignore
         return self.CELERY_BROKER_URL
 
+    @computed_field
+    @property
+    def STEAM_API_RATE_LIMIT_STORAGE_URL(self) -> str:  # type: ignore
+        return self.CELERY_BROKER_URL
+
     RABBITMQ_HOST: str = 'orchestrator-worker-broker'
     RABBITMQ_PORT: int = 5672
     RABBITMQ_USER: str = 'user'
@@ -114,11 +154,12 @@ class WorkerSettings(BaseSettings):
     RABBITMQ_OUTCOME_QUERY: str = 'tasks_for_orchestrator'
     RABBITMQ_CONNECTION_ATTEMPTS: int = 3
     RABBITMQ_CONNECTION_RETRY_DELAY: int = 3
-    RABBITMQ_HEARTBEATS_TIMEOUT: int = 30
     RABBITMQ_HEARTBEATS_MAX_DELAY: int = 120
+    RABBITMQ_PREFETCH_COUNT: int = 4
+    RABBITMQ_PUBLISH_BATCH_SIZE: int = 100
     RABBITMQ_QUEUE_MESSAGE_TTL: int = 1000 * 60 * 60 * 24 * 7  # 7 days
 
-    @field_validator("CELERY_TASK_COMMON_RATE_LIMIT")
+    @field_validator("CELERY_TASK_COMMON_RATE_LIMIT", "STEAM_API_RATE_LIMIT")
     @classmethod
     def validate_employee_id(cls, v: str, info):
         if not v.endswith('/m'):
@@ -1,19 +1,33 @@
 import asyncio
 import functools
 import json
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from logging import Logger
 from typing import Any, Optional
 
-import pika
-from pika.adapters.blocking_connection import BlockingChannel
-from pika.spec import BasicProperties, Basic
+import aio_pika
+from aio_pika.abc import AbstractChannel, AbstractIncomingMessage
 
 from worker.core.config import settings
 from worker.core.logger import get_logger
-from worker.celery import execute_celery_task, get_app_list_celery_task, get_app_detail_celery_task
+from worker.celery import (
+    execute_celery_task,
+    read_app_list_chunks,
+    delete_app_list_chunks,
+    promote_app_list_snapshot,
+    stream_app_list_celery_task,
+    get_app_detail_celery_task,
+    get_apps_prices_celery_task,
+)
 from worker.api import SteamAPIClient, AsyncBackendAPIClient
+from worker.api.backend import AsyncBackendSessionClient
 from .utils import (
     convert_steam_app_data_response_to_backend_app_data_package,
+    convert_steam_apps_prices_response_to_backend_app_data_packages,
+    build_pair_refresh_signals,
+    batch_slicer,
+    gather_or_cancel,
     trace_logs,
     HandledException,
     HandledCriticalException
@@ -34,12 +48,70 @@ class TaskManagerMeta(type):
         return new_class
 
 
+def build_update_apps_status_task_context(
+        app_ids: list[int],
+        country_codes: list[str],
+        sent_packages: list[dict[str, Any]]
+) -> dict[str, Any]:
+    """
+    Orchestrator keeps status of every app and country pair, so failed pairs are retried separately
+    """
+
+    updated_pairs = [build_pair_refresh_signals(package) for package in sent_packages]
+    sent_pairs = {(pair['app_id'], pair['country_code']) for pair in updated_pairs}
+    failed_pairs = [
+        [app_id, country_code]
+        for app_id in app_ids
+        for country_code in country_codes
+        if (app_id, country_code) not in sent_pairs
+    ]
+    return {
+        "task_name": "update_apps_status",
+        "params": {
+            "updated_pairs": updated_pairs,
+            "failed_pairs": failed_pairs
+        }
+    }
+
+
+class TasksBatch:
+    def __init__(self, task_manager: 'TaskManager', max_size: int = settings.RABBITMQ_PUBLISH_BATCH_SIZE):
+        self.task_manager = task_manager
+        self.max_size = max_size
+        self._messages: list[aio_pika.Message] = []
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    async def register_task(self, task_context: dict[str, Any], message_priority: int = 1):
+        self._messages.append(self.task_manager.build_task_message(task_context, message_priority))
+
+        if len(self._messages) >= self.max_size:
+            await self.flush()
+
+    async def flush(self):
+        """
+        Messages are published without waiting for each other's confirmations,
+        flush returns when broker has confirmed all of them
+        """
+
+        if not self._messages:
+            return
+
+        messages, self._messages = self._messages, []
+        exchange = self.task_manager.messenger_channel.default_exchange
+        await asyncio.gather(*(
+            exchange.publish(message, routing_key=settings.RABBITMQ_OUTCOME_QUERY)
+            for message in messages
+        ))
+
+
 class TaskManager(metaclass=TaskManagerMeta):
     DEFAULT_MESSAGE_PRIORITY: int = 1
 
     def __init__(
         self,
-        messenger_channel: BlockingChannel,
+        messenger_channel: AbstractChannel,
         backend_api_client: AsyncBackendAPIClient,
         steam_api_client: SteamAPIClient,
         logger: Logger = None
@@ -51,99 +123,209 @@ class TaskManager(metaclass=TaskManagerMeta):
 
     def execute_task(self, task: callable) -> callable:
         @functools.wraps(task)
-        def wrapper(*args, **kwargs) -> Any:
-            loop = asyncio.get_event_loop()
-            return loop.run_until_complete(task(self, **kwargs))
+        async def wrapper(*args, **kwargs) -> Any:
+            return await task(self, **kwargs)
 
         return wrapper
 
     def get_receive_task_handler(self, task_name: str) -> Optional[callable]:
         return self._receive_tasks.get(task_name)
 
-    def register_task(self, task_context: dict[str, Any], message_priority: int = 1):
+    def build_task_message(self, task_context: dict[str, Any], message_priority: int = 1) -> aio_pika.Message:
         context_json_payload = json.dumps(task_context)
         if message_priority is None:
             message_priority = self.DEFAULT_MESSAGE_PRIORITY
 
-        self.messenger_channel.basic_publish(
-            exchange='',
+        return aio_pika.Message(
+            body=context_json_payload.encode(),
+            delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+            priority=message_priority
+        )
+
+    async def register_task(self, task_context: dict[str, Any], message_priority: int = 1):
+        await self.messenger_channel.default_exchange.publish(
+            self.build_task_message(task_context, message_priority),
             routing_key=settings.RABBITMQ_OUTCOME_QUERY,
-            body=context_json_payload,
-            properties=pika.BasicProperties(
-                delivery_mode=pika.DeliveryMode.Persistent,
-                priority=message_priority
-            )
         )
 
-    def handle_received_task_message(
-            self, ch: BlockingChannel, method: Basic.Deliver, properties: BasicProperties, body: bytes):
-        data = json.loads(body)
+    @asynccontextmanager
+    async def batched_publishing(self) -> AsyncIterator['TasksBatch']:
+        """
+        Tasks registered in the batch are published together when the batch overflows and on exit from the context.
+        Tasks left in the batch are discarded if an exception is raised within the context.
+        """
+
+        tasks_batch = TasksBatch(self)
+        yield tasks_batch
+        await tasks_batch.flush()
+
+    async def handle_received_task_message(self, message: AbstractIncomingMessage):
+        data = json.loads(message.body)
 
         if not (requested_task_name := data.get('task_name')):
             # TODO: id of message & logging it (broker deletes messages - save wrong messages for debug?)
             self.logger.error('Message received from orchestrator doesnt contain "task_name". Message discarded.')
-            ch.basic_reject(delivery_tag=method.delivery_tag)
+            await message.reject(requeue=True)
             return
 
         if not (handle_received_task := self.get_receive_task_handler(requested_task_name)):
             self.logger.error(f'Message received from orchestrator contains an invalid task name '
                          f'- a task named "{requested_task_name}" does not exist. Message discarded.')
-            ch.basic_reject(delivery_tag=method.delivery_tag)
+            await message.reject(requeue=True)
             return
 
         try:
             task_params = data.get('params', {})
-            handle_received_task(self, ch, method, properties, task_params)
+            await handle_received_task(self, message, task_params)
 
         except TypeError:
             error_msg = f'The parameters passed to the task "{requested_task_name}" do not match its signature'
             self.logger.error(error_msg)
-            ch.basic_reject(delivery_tag=method.delivery_tag)
+            await message.reject(requeue=True)
 
         except HandledException:
-            ch.basic_reject(delivery_tag=method.delivery_tag)
+            await message.reject(requeue=True)
 
         except HandledCriticalException as error:
-            ch.basic_reject(delivery_tag=method.delivery_tag)
+            await message.reject(requeue=True)
             raise error
 
         except Exception as unhandled_error:
             error_msg = f'Task "{requested_task_name}" execution failed with error: {unhandled_error}'
             self.logger.error(error_msg)
-            ch.basic_reject(delivery_tag=method.delivery_tag)
+            await message.reject(requeue=True)
 
         else:
-            ch.basic_ack(delivery_tag=method.delivery_tag)
+            await message.ack()
+
+    async def _request_app_data(
+            self,
+            requests_semaphore: asyncio.Semaphore,
+            app_id: int,
+            country_code: str,
+            task_name: str
+    ) -> dict[str, Any] | None:
+        request_params = {
+            'app_id': app_id,
+            'country_code': country_code
+        }
+
+        async with requests_semaphore:
+            app_data_response, is_success = await execute_celery_task(
+                celery_task=get_app_detail_celery_task,  # type: ignore
+                **request_params
+            )
+
+        if not is_success:
+            self.logger.warning(
+                f'Task "{task_name}":'
+                f' Requesting app "{app_id}" with country code "{country_code}" failed'
+            )
+            return None
+
+        return convert_steam_app_data_response_to_backend_app_data_package(
+            request_params,
+            app_data_response,
+            self.logger
+        )
+
+    async def _send_packages_to_backend(
+            self,
+            backend_session: AsyncBackendSessionClient,
+            backend_packages: list[dict[str, Any]],
+            task_name: str
+    ) -> list[dict[str, Any]]:
+        """
+        Packages are sent in bulks, returns the packages accepted by backend
+        """
+
+        async def send_bulk(bulk_of_packages: list[dict[str, Any]]) -> list[dict[str, Any]]:
+            try:
+                backend_response = await backend_session.post_app_data_packages(bulk_of_packages) or {}
+
+            except AuthenticationError as auth_error:
+                raise auth_error
+
+            except Exception as error:
+                self.logger.warning(
+                    f'Task "{task_name}": Error while sending {len(bulk_of_packages)} packages to backend.'
+                    f' Error: {error}'
+                )
+                return []
+
+            accepted_app_ids = set(backend_response.get('app_ids', []))
+            accepted_packages = [package for package in bulk_of_packages if package['data']['id'] in accepted_app_ids]
+
+            for package in accepted_packages:
+                package['updated_at'] = backend_response.get('updated_at')
+
+            return accepted_packages
+
+        bulks_results = await gather_or_cancel(*(
+            send_bulk(bulk_of_packages)
+            for bulk_of_packages in batch_slicer(backend_packages, settings.BACKEND_PACKAGES_BULK_SIZE)
+        ))
+        return [package for bulk_results in bulks_results for package in bulk_results]
 
     @trace_logs
-    def receive_task__request_apps_list(
-            self, ch: BlockingChannel, method: Basic.Deliver, properties: BasicProperties, task_params: dict[str, Any]):
-        async def _task(*args, **kwargs) -> list[str]:
+    async def receive_task__request_apps_list(
+            self, message: AbstractIncomingMessage, task_params: dict[str, Any]):
+        async def _task(*args, **kwargs) -> dict[str, Any]:
             self.logger.info('Task "request_apps_list": Start execution.')
 
-            apps_collection, is_success = await execute_celery_task(celery_task=get_app_list_celery_task)
+            stream_result, is_success = await execute_celery_task(
+                celery_task=stream_app_list_celery_task,  # type: ignore
+                full_reconciliation=full_reconciliation
+            )
             if not is_success:
                 error_msg = 'Task "request_apps_list": Requesting apps list failed. Execution interrupted.'
                 self.logger.error(error_msg)
                 raise HandledException(error_msg)
 
-            app_list = [app.get('appid') for app in apps_collection.get('applist', {}).get('apps', {})]
-            self.logger.info('Task "request_apps_list": Apps list successfully requested. Completion of execution.')
-            return app_list
+            self.logger.info('Task "request_apps_list": Apps list successfully requested.')
+            return stream_result
 
-        result = self.execute_task(_task)()
-        orchestrator_task_context = {
-            # TODO: task names as settings consts
-            "task_name": "actualize_app_list",
-            "params": {
-                "app_ids": result
-            }
-        }
-        self.register_task(orchestrator_task_context, message_priority=properties.priority)
+        full_reconciliation = task_params.get('full_reconciliation', False)
+        stream_result = await self.execute_task(_task)()
+
+        if stream_result['staged_snapshot_key'] is None:
+            self.logger.warning('Task "request_apps_list": Steam returned empty apps list. Nothing sent.')
+            return
+
+        # every chunk is sent as separate task, so there is no need to hold the whole list in memory
+        async with self.batched_publishing() as tasks_batch:
+            async for app_ids in read_app_list_chunks(stream_result['chunks_key']):
+                orchestrator_task_context = {
+                    # TODO: task names as settings consts
+                    "task_name": "actualize_app_list",
+                    "params": {
+                        "app_ids": app_ids
+                    }
+                }
+                await tasks_batch.register_task(orchestrator_task_context, message_priority=message.priority)
+
+            async for removed_app_ids in read_app_list_chunks(stream_result['removed_chunks_key']):
+                orchestrator_task_context = {
+                    "task_name": "actualize_app_list",
+                    "params": {
+                        "removed_app_ids": removed_app_ids
+                    }
+                }
+                await tasks_batch.register_task(orchestrator_task_context, message_priority=message.priority)
+
+        # all chunks are confirmed by broker, so the found changes can't be lost anymore
+        await delete_app_list_chunks(stream_result['chunks_key'], stream_result['removed_chunks_key'])
+        await promote_app_list_snapshot(stream_result['staged_snapshot_key'])
+
+        self.logger.info(
+            f'Task "request_apps_list": {"Full" if stream_result["is_full"] else "Incremental"} apps list sent'
+            f' in {stream_result["chunks_count"]} chunks of actual apps'
+            f' and {stream_result["removed_chunks_count"]} chunks of removed apps. Completion of execution.'
+        )
 
     @trace_logs
-    def receive_task__request_app_data(
-            self, ch: BlockingChannel, method: Basic.Deliver, properties: BasicProperties, task_params: dict[str, Any]):
+    async def receive_task__request_app_data(
+            self, message: AbstractIncomingMessage, task_params: dict[str, Any]):
         async def _task(*args, **kwargs):
             self.logger.info(f'Task request_app_data": Start execution.')
             self.logger.debug(f'Task "request_app_data": Requested AppID: {app_id} CountryCode: {country_code}')
@@ -167,7 +349,8 @@ class TaskManager(metaclass=TaskManagerMeta):
                 self.logger
             )
             try:
-                await self.backend_api_client.post_app_data_package(backend_package)
+                backend_response = await self.backend_api_client.post_app_data_package(backend_package) or {}
+                backend_package['updated_at'] = (backend_response.get('data') or {}).get('timestamp')
 
             except AuthenticationError:
                 error_message = (
@@ -187,6 +370,7 @@ class TaskManager(metaclass=TaskManagerMeta):
                 raise HandledException(error_message)
 
             self.logger.info(f'Task "request_app_data": App data successfully requested. Completion of execution.')
+            return backend_package
 
         # main body ###########################
 
@@ -201,114 +385,171 @@ class TaskManager(metaclass=TaskManagerMeta):
                 f'Default country selected - {country_code}'
             )
 
-        self.execute_task(_task)()
+        backend_package = await self.execute_task(_task)()
         orchestrator_task_context = {
             "task_name": "update_apps_status",
             "params": {
-                "app_ids": [app_id]
+                "updated_pairs": [build_pair_refresh_signals(backend_package)]
             }
         }
-        self.register_task(orchestrator_task_context, message_priority=properties.priority)
+        await self.register_task(orchestrator_task_context, message_priority=message.priority)
 
     @trace_logs
-    def receive_task__bulk_request_for_apps_data(
-            self, ch: BlockingChannel, method: Basic.Deliver, properties: BasicProperties, task_params):
+    async def receive_task__bulk_request_for_apps_data(
+            self, message: AbstractIncomingMessage, task_params: dict[str, Any]):
         async def _task(*args, **kwargs):
             self.logger.info(
                 f'Task "bulk_request_for_apps_data":'
                 f' Batch of app IDs size: {len(batch_of_app_ids)} country codes: {country_codes}'
             )
 
-            backend_request_tasks = set()
-            successfully_updated_app_ids = set()
+            # Steam requests are still throttled by the celery rate limit, the semaphore only bounds
+            # the amount of simultaneously awaited app/country pairs
+            requests_semaphore = asyncio.Semaphore(settings.STEAM_REQUESTS_CONCURRENCY)
+
+            requests_for_apps_data = [
+                self._request_app_data(requests_semaphore, app_id, country_code, 'bulk_request_for_apps_data')
+                for app_id in batch_of_app_ids
+                for country_code in country_codes
+            ]
+            backend_packages = [package for package in await gather_or_cancel(*requests_for_apps_data) if package]
 
-            def save_successfully_updated_app_id_and_clear_task_pool(backend_task: asyncio.Task):
-                # TODO: if task has exception (because of it asyncio.wait stopped and this in done) ?
-                backend_request_tasks.discard(backend_task)
+            async with self.backend_api_client as backend_session:
                 try:
-                    task_result = backend_task.result() or {}
+                    sent_packages = await self._send_packages_to_backend(
+                        backend_session, backend_packages, 'bulk_request_for_apps_data'
+                    )
+
+                except AuthenticationError:
+                    error_message = 'Task "bulk_request_for_apps_data": Backend client can\'t be authenticated.'
+                    self.logger.critical(error_message)
+                    raise HandledCriticalException(error_message)
+
+            self.logger.info(
+                f'Task "bulk_request_for_apps_data":'
+                f' Successfully updated pairs: {len(sent_packages)} of {len(requests_for_apps_data)}'
+            )
+            return sent_packages
+
+        # main body ###########################
+
+        if not (batch_of_app_ids := task_params.get('app_ids', [])):
+            self.logger.warning('Task "bulk_request_for_apps_data": Receive empty batch of app ids')
+            return
+
+        if not (country_codes := task_params.get('country_codes', settings.DEFAULT_COUNTRY_BUNDLE)):
+            country_codes = settings.DEFAULT_COUNTRY_BUNDLE
+            self.logger.warning(
+                f'Task "bulk_request_for_apps_data": No country specified for batch of apps data request. '
+                f'Default country bundle selected - {country_codes}'
+            )
+
+        sent_packages = await self.execute_task(_task)()
+        await self.register_task(
+            build_update_apps_status_task_context(batch_of_app_ids, country_codes, sent_packages),
+            message_priority=message.priority
+        )
+
+    @trace_logs
+    async def receive_task__bulk_request_for_apps_prices(
+            self, message: AbstractIncomingMessage, task_params: dict[str, Any]):
+        """
+        Prices of several apps are requested from Steam in one request per country.
+        Apps with outdated metadata and apps that have no price data in batch response
+        are requested separately with full details.
+        """
+
+        async def _task(*args, **kwargs):
+            self.logger.info(
+                f'Task "bulk_request_for_apps_prices":'
+                f' Batch of app IDs size: {len(batch_of_app_ids)} country codes: {country_codes}'
+                f' Apps with outdated metadata: {len(outdated_app_ids)}'
+            )
+
+            requests_semaphore = asyncio.Semaphore(settings.STEAM_REQUESTS_CONCURRENCY)
+            app_ids_for_price_requests = [app_id for app_id in batch_of_app_ids if app_id not in outdated_app_ids]
 
-                except Exception:
+            async def request_apps_prices_in_country(app_ids: list[int], country_code: str) -> list[dict[str, Any]]:
+                async with requests_semaphore:
+                    apps_prices_response, is_success = await execute_celery_task(
+                        celery_task=get_apps_prices_celery_task,  # type: ignore
+                        app_ids=app_ids,
+                        country_code=country_code
+                    )
+
+                if not is_success:
                     self.logger.warning(
-                        f'Task "bulk_request_for_apps_data":'
-                        f' Error while saving successfully updated app'
+                        f'Task "bulk_request_for_apps_prices":'
+                        f' Requesting prices of {len(app_ids)} apps with country code "{country_code}" failed'
+                    )
+                    return []
+
+                backend_packages, app_ids_without_prices = (
+                    convert_steam_apps_prices_response_to_backend_app_data_packages(
+                        app_ids, country_code, apps_prices_response, self.logger
                     )
-                    return
-
-                updated_app_id = task_result.get('data', {}).get('id')
-                # FIXME: The same id is hit multiple times (since one app is requested in multiple countries).
-                #        The DB orchestrator does not store a record of the update time of the id and country pair,
-                #        but only about the app. That is, if out of 7 requested countries, 6 are received successfully,
-                #        and one failed, then the app should not be considered successfully updated.
-                #        In the current implementation, if at least one country of app was successfully updated,
-                #        then the app_id will be in the set => it will be written in db as successfully updated.
-                if updated_app_id:
-                    successfully_updated_app_ids.add(updated_app_id)
+                )
+                apps_details_packages = await gather_or_cancel(*(
+                    self._request_app_data(requests_semaphore, app_id, country_code, 'bulk_request_for_apps_prices')
+                    for app_id in app_ids_without_prices
+                ))
+
+                return backend_packages + [package for package in apps_details_packages if package]
+
+            requests_for_prices = [
+                request_apps_prices_in_country(batch_of_app_ids_for_price_request, country_code)
+                for country_code in country_codes
+                for batch_of_app_ids_for_price_request in batch_slicer(
+                    app_ids_for_price_requests, settings.STEAM_APPS_PRICES_BATCH_SIZE
+                )
+            ]
+            requests_for_apps_details = [
+                self._request_app_data(requests_semaphore, app_id, country_code, 'bulk_request_for_apps_prices')
+                for app_id in outdated_app_ids
+                for country_code in country_codes
+            ]
+            prices_packages, apps_details_packages = await gather_or_cancel(
+                gather_or_cancel(*requests_for_prices),
+                gather_or_cancel(*requests_for_apps_details)
+            )
+
+            backend_packages = [package for batch_packages in prices_packages for package in batch_packages]
+            backend_packages.extend(package for package in apps_details_packages if package)
 
             async with self.backend_api_client as backend_session:
-                for app_id in batch_of_app_ids:
-                    for country_code in country_codes:
-                        request_params = {
-                            'app_id': app_id,
-                            'country_code': country_code
-                        }
-
-                        app_data_response, is_success = await execute_celery_task(
-                            celery_task=get_app_detail_celery_task,  # type: ignore
-                            **request_params
-                        )
-                        if not is_success:
-                            self.logger.warning(
-                                f'Task "bulk_request_for_apps_data":'
-                                f' Requesting app "{app_id}" with country code "{country_code}" failed'
-                            )
-                            continue
-
-                        backend_package = convert_steam_app_data_response_to_backend_app_data_package(
-                            request_params,
-                            app_data_response,
-                            self.logger
-                        )
-
-                        task = asyncio.create_task(backend_session.post_app_data_package(backend_package))
-                        backend_request_tasks.add(task)
-                        task.add_done_callback(save_successfully_updated_app_id_and_clear_task_pool)
-
-                if not backend_request_tasks:
-                    return list(successfully_updated_app_ids)
-
-                done, pending = await asyncio.wait(backend_request_tasks, return_when=asyncio.FIRST_EXCEPTION)
-
-                if exc := done.pop().exception():
-                    for task in pending:
-                        task.cancel()
-
-                    self.logger.error(
-                        f'Task "bulk_request_for_apps_data": Receive an error.'
-                        f" Batch of app IDs size: {len(batch_of_app_ids)} Country Codes: {country_codes}"
-                        f" Error: {exc}"
-                        f" Amount of canceled tasks (except task with error): {len(pending)}"
+                try:
+                    sent_packages = await self._send_packages_to_backend(
+                        backend_session, backend_packages, 'bulk_request_for_apps_prices'
                     )
 
-                return list(successfully_updated_app_ids)
+                except AuthenticationError:
+                    error_message = 'Task "bulk_request_for_apps_prices": Backend client can\'t be authenticated.'
+                    self.logger.critical(error_message)
+                    raise HandledCriticalException(error_message)
+
+            self.logger.info(
+                f'Task "bulk_request_for_apps_prices":'
+                f' Successfully updated pairs: {len(sent_packages)} of {len(batch_of_app_ids) * len(country_codes)}'
+            )
+            return sent_packages
 
         # main body ###########################
 
         if not (batch_of_app_ids := task_params.get('app_ids', [])):
-            self.logger.warning('Task "bulk_request_for_apps_data": Receive empty batch of app ids')
+            self.logger.warning('Task "bulk_request_for_apps_prices": Receive empty batch of app ids')
             return
 
-        if not (country_codes := task_params.get('country_code', settings.DEFAULT_COUNTRY_BUNDLE)):
+        if not (country_codes := task_params.get('country_codes', settings.DEFAULT_COUNTRY_BUNDLE)):
+            country_codes = settings.DEFAULT_COUNTRY_BUNDLE
             self.logger.warning(
-                f'Task "bulk_request_for_apps_data": No country specified for batch of apps data request. '
+                f'Task "bulk_request_for_apps_prices": No country specified for batch of apps prices request. '
                 f'Default country bundle selected - {country_codes}'
             )
 
-        result = self.execute_task(_task)()
-        orchestrator_task_context = {
-            "task_name": "update_apps_status",
-            "params": {
-                "app_ids": result
-            }
-        }
-        self.register_task(orchestrator_task_context, message_priority=properties.priority)
+        outdated_app_ids = set(task_params.get('outdated_app_ids', [])) & set(batch_of_app_ids)
+
+        sent_packages = await self.execute_task(_task)()
+        await self.register_task(
+            build_update_apps_status_task_context(batch_of_app_ids, country_codes, sent_packages),
+            message_priority=message.priority
+        )
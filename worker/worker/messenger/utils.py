@@ -14,6 +14,27 @@ class HandledCriticalException(Exception):
     pass
 
 
+def batch_slicer(collection, batch_size=1000):
+    for i in range(0, len(collection), batch_size):
+        yield collection[i:i + batch_size]
+
+
+async def gather_or_cancel(*coroutines) -> list[Any]:
+    """
+    Like asyncio.gather, but the first error cancels the rest of the coroutines and is raised as is,
+    so a failed batch doesn't keep spending Steam rate limit tokens
+    """
+
+    try:
+        async with asyncio.TaskGroup() as task_group:
+            tasks = [task_group.create_task(coroutine) for coroutine in coroutines]
+
+    except BaseExceptionGroup as errors:
+        raise errors.exceptions[0]
+
+    return [task.result() for task in tasks]
+
+
 def trace_logs(decorated: callable) -> callable:
     @functools.wraps(decorated)
     def sync_wrapper(self, *args, **kwargs) -> Any:
@@ -89,6 +110,27 @@ def convert_steam_app_data_response_to_backend_app_data_package(request_params:
     return {'is_success': is_success, 'data': package_data}
 
 
+def build_pair_refresh_signals(package: dict[str, Any]) -> dict[str, Any]:
+    """
+    Orchestrator schedules next update of the app in the country by these signals,
+    starting from the time the package was applied by backend
+    """
+
+    package_data = package['data']
+    return {
+        'app_id': package_data.get('id'),
+        'country_code': package_data.get('country_code'),
+        'updated_at': package.get('updated_at'),
+        'is_available': bool(package.get('is_success')),
+        'price': package_data.get('price'),
+        'discount': package_data.get('discount'),
+        'is_free': package_data.get('is_free'),
+        'total_recommendations': package_data.get('total_recommendations'),
+        # price-only packages don't carry app details
+        'is_metadata_updated': bool(package_data.get('name')),
+    }
+
+
 def build_failed_task_package_data(request_params: dict):
     return {
         'id': request_params.get('app_id'),
@@ -96,6 +138,52 @@ def build_failed_task_package_data(request_params: dict):
     }
 
 
+def convert_steam_apps_prices_response_to_backend_app_data_packages(
+        app_ids: list[int],
+        country_code: str,
+        response: dict[str, Any],
+        logger: Logger
+) -> tuple[list[dict[str, Any]], list[int]]:
+    """
+    Returns packages of apps with received prices and IDs of apps that must be requested with full details -
+    Steam returns no price data for free apps and apps that can't be bought
+    """
+
+    packages = []
+    app_ids_without_prices = []
+
+    for app_id in app_ids:
+        request_params = {'app_id': app_id, 'country_code': country_code}
+        app_response = response.get(str(app_id)) or {}
+
+        if not (is_success := app_response.get('success', False)):
+            logger.debug(f"Request for a game id={app_id} prices is failed. "
+                         f"Looks like game is unavailable in {country_code}"
+            )
+            packages.append({'is_success': is_success, 'data': build_failed_task_package_data(request_params)})
+
+        elif not (price_overview := (app_response.get('data') or {}).get('price_overview')):
+            app_ids_without_prices.append(app_id)
+
+        else:
+            packages.append({
+                'is_success': is_success,
+                'data': build_price_package_data(price_overview, request_params)
+            })
+
+    return packages, app_ids_without_prices
+
+
+def build_price_package_data(price_overview: dict[str, Any], request_params: dict[str, Any]) -> dict[str, Any]:
+    return {
+        'id': request_params.get('app_id'),
+        'country_code': request_params.get('country_code'),
+        'currency': price_overview.get('currency'),
+        'discount': price_overview.get('discount_percent', 0),
+        'price': float(price_overview.get('final', 0)) / 100.0,
+    }
+
+
 class BackendPackageDataBuilder:
     backend_package_data_build_schema: dict[str, callable] = ...
     